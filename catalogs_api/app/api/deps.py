@@ -1,5 +1,6 @@
 from typing import Annotated, Any
 
+from bson import ObjectId
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
@@ -25,12 +26,12 @@ async def get_current_user(
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         user_id: str | None = payload.get('sub')
-        if user_id is None:
+        if user_id is None or not ObjectId.is_valid(user_id):
             raise credentials_exception
     except JWTError as err:
         raise credentials_exception from err
 
-    user_dict = await db.users.find_one({'_id': user_id})
+    user_dict = await db.users.find_one({'_id': ObjectId(user_id)})
     if user_dict is None:
         raise credentials_exception
 
@@ -1,4 +1,4 @@
-from datetime import timedelta
+from datetime import UTC, datetime, timedelta
 from typing import Annotated, Any
 
 from fastapi import APIRouter, Depends, HTTPException, status
@@ -8,6 +8,7 @@ from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.core.config import settings
 from app.core.security import create_access_token, get_password_hash, verify_password
 from app.database.mongodb import get_database
+from app.database.write_behind import write_behind
 from app.models import User
 from app.schemas import Token, UserCreate, UserResponse
 
@@ -36,6 +37,8 @@ async def login(
             headers={'WWW-Authenticate': 'Bearer'},
         )
 
+    write_behind.update('users', user.id, {'$set': {'last_login_at': datetime.now(UTC)}})
+
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={'sub': str(user.id)},
@@ -66,7 +69,7 @@ async def register(
     # Convert model to dict but exclude id since MongoDB will generate it
     user_dict = user.model_dump(by_alias=True, exclude={'id'})
     result = await db['users'].insert_one(user_dict)
-    user.id = str(result.inserted_id)
+    user.id = result.inserted_id
 
     return UserResponse(
         id=str(user.id),
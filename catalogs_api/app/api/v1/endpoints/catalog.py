@@ -0,0 +1,72 @@
+from collections.abc import AsyncIterator
+from typing import Annotated, Any
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.exceptions import RequestValidationError
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pydantic import TypeAdapter, ValidationError
+
+from app.api.deps import get_current_user
+from app.database.catalog import CatalogSync
+from app.database.mongodb import get_database
+from app.models import User
+from app.schemas import CatalogCategory, CatalogItem, CatalogSyncResponse
+
+router = APIRouter()
+
+catalog_item: TypeAdapter[CatalogItem] = TypeAdapter(CatalogItem)
+
+
+async def read_lines(request: Request) -> AsyncIterator[bytes]:
+    """Yield the lines of the request body as it streams in."""
+    buffer = b''
+    async for chunk in request.stream():
+        *lines, buffer = (buffer + chunk).split(b'\n')
+        for line in lines:
+            yield line
+    yield buffer
+
+
+@router.put('/')
+async def put_catalog(
+    request: Request,
+    db: Annotated[AsyncIOMotorDatabase[Any], Depends(get_database)],
+    current_user: Annotated[User, Depends(get_current_user)],
+) -> CatalogSyncResponse:
+    """Replace the catalog with the desired state sent in the request body.
+
+    The body is newline-delimited JSON with one category or product per line, each keyed
+    by its `external_id`. Lines are applied as they are read, so the catalog is never held
+    in memory whole. Items missing from the body are deleted, and unchanged items cost no
+    writes. A rejected line leaves the lines before it applied, but nothing is deleted;
+    sending the catalog again completes the sync.
+    """
+    catalog = CatalogSync(db, current_user.id)
+    await catalog.load()
+
+    line_number = 0
+    async for line in read_lines(request):
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            item = catalog_item.validate_json(line)
+        except ValidationError as err:
+            await catalog.flush()
+            raise RequestValidationError(
+                [{**error, 'loc': ('body', line_number, *error['loc'])} for error in err.errors(include_url=False)]
+            ) from err
+        try:
+            if isinstance(item, CatalogCategory):
+                await catalog.apply_category(item)
+            else:
+                await catalog.apply_product(item)
+        except ValueError as err:
+            await catalog.flush()
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f'Line {line_number}: {err}',
+            ) from err
+
+    await catalog.finish()
+    return CatalogSyncResponse(categories=catalog.counts['categories'], products=catalog.counts['products'])
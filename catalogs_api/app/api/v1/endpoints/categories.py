@@ -1,16 +1,50 @@
+from datetime import UTC, datetime
 from typing import Annotated, Any
 
+from bson import ObjectId
 from fastapi import APIRouter, Depends, HTTPException, status
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
 
 from app.api.deps import get_current_user
+from app.core.events import publish_change
+from app.database.categories import descendants_of, move_descendants
+from app.database.changes import claim_sequence
 from app.database.mongodb import get_database
-from app.models import Category, User
+from app.database.write_behind import audit
+from app.models import Category, PyObjectId, User
 from app.schemas import CategoryCreate, CategoryUpdate
 
 router = APIRouter()
 
 
+async def find_parent(db: AsyncIOMotorDatabase[Any], owner_id: ObjectId, parent_id: ObjectId) -> Category:
+    """Get the parent of a category being created or moved."""
+    parent = await db.categories.find_one({'_id': parent_id, 'owner_id': owner_id, 'deleted_at': None})
+    if not parent:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='Parent category not found',
+        )
+    return Category(**parent)
+
+
+async def moved_path(
+    db: AsyncIOMotorDatabase[Any],
+    owner_id: ObjectId,
+    category_id: ObjectId,
+    parent_id: ObjectId | None,
+) -> list[ObjectId]:
+    """Get the path of a category moved under a new parent, or to the root."""
+    path = [*(await find_parent(db, owner_id, parent_id)).path, category_id] if parent_id else [category_id]
+    if category_id in path[:-1]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Cannot move a category into its own subtree',
+        )
+    return path
+
+
 @router.post('/')
 async def create_category(
     category_in: CategoryCreate,
@@ -18,13 +52,16 @@ async def create_category(
     current_user: Annotated[User, Depends(get_current_user)],
 ) -> Category:
     """Create new category."""
-    category = Category(
-        **category_in.model_dump(),
-        owner_id=str(current_user.id),
-    )
-
-    result = await db.categories.insert_one(category.model_dump(by_alias=True))
-    category.id = str(result.inserted_id)
+    category = Category(**category_in.model_dump(), owner_id=current_user.id)
+    if category.parent_id is not None:
+        category.path = [*(await find_parent(db, current_user.id, category.parent_id)).path, category.id]
+
+    async with claim_sequence(db, current_user.id) as seq:
+        category.seq = seq
+        result = await db.categories.insert_one(category.model_dump(by_alias=True))
+    category.id = result.inserted_id
+    publish_change(category)
+    audit('created', category)
     return category
 
 
@@ -34,19 +71,19 @@ async def list_categories(
     current_user: Annotated[User, Depends(get_current_user)],
 ) -> list[Category]:
     """List all categories for current user."""
-    cursor = db.categories.find({'owner_id': str(current_user.id)})
+    cursor = db.categories.find({'owner_id': current_user.id, 'deleted_at': None})
     categories = await cursor.to_list(length=None)
     return [Category(**category) for category in categories]
 
 
 @router.get('/{category_id}')
 async def get_category(
-    category_id: str,
+    category_id: PyObjectId,
     db: Annotated[AsyncIOMotorDatabase[Any], Depends(get_database)],
     current_user: Annotated[User, Depends(get_current_user)],
 ) -> Category:
     """Get a specific category."""
-    category = await db.categories.find_one({'_id': category_id, 'owner_id': str(current_user.id)})
+    category = await db.categories.find_one({'_id': category_id, 'owner_id': current_user.id, 'deleted_at': None})
     if not category:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -57,50 +94,106 @@ async def get_category(
 
 @router.put('/{category_id}')
 async def update_category(
-    category_id: str,
+    category_id: PyObjectId,
     category_in: CategoryUpdate,
     db: Annotated[AsyncIOMotorDatabase[Any], Depends(get_database)],
     current_user: Annotated[User, Depends(get_current_user)],
 ) -> Category:
-    """Update a category."""
-    category = await db.categories.find_one({'_id': category_id, 'owner_id': str(current_user.id)})
+    """Update a category.
+
+    Setting `parent_id` moves the category, and a single `update_many` rewrites the paths
+    of all its descendants.
+    """
+    query = {'_id': category_id, 'owner_id': current_user.id, 'deleted_at': None}
+    update_data = category_in.model_dump(exclude_unset=True)
+
+    old_path = None
+    if 'parent_id' in update_data:
+        category = await db.categories.find_one(query, {'path': 1})
+        if not category:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail='Category not found',
+            )
+        path = await moved_path(db, current_user.id, category_id, update_data['parent_id'])
+        if path != category.get('path'):
+            update_data['path'] = path
+            old_path = category.get('path', [category_id])
+
+    if update_data:
+        update_data['updated_at'] = datetime.now(UTC)
+        update_data['content_hash'] = None
+        async with claim_sequence(db, current_user.id) as seq:
+            update_data['seq'] = seq
+            category = await db.categories.find_one_and_update(
+                query,
+                {'$set': update_data},
+                return_document=ReturnDocument.AFTER,
+            )
+            if category and old_path is not None:
+                await move_descendants(db, Category(**category), old_path)
+    else:
+        category = await db.categories.find_one(query)
     if not category:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail='Category not found',
         )
-
-    update_data = category_in.model_dump(exclude_unset=True)
+    updated = Category(**category)
     if update_data:
-        await db.categories.update_one({'_id': category_id}, {'$set': update_data})
+        publish_change(updated)
+        audit('updated', updated)
 
-    updated_category = await db.categories.find_one({'_id': category_id})
-    if not updated_category:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail='Category not found after update',
-        )
-    return Category(**updated_category)
+    if old_path is not None:
+        for descendant in await db.categories.find(descendants_of(current_user.id, category_id)).to_list(length=None):
+            publish_change(Category(**descendant))
+    return updated
 
 
 @router.delete('/{category_id}')
 async def delete_category(
-    category_id: str,
+    category_id: PyObjectId,
     db: Annotated[AsyncIOMotorDatabase[Any], Depends(get_database)],
     current_user: Annotated[User, Depends(get_current_user)],
 ) -> dict[str, str]:
-    """Delete a category."""
-    product = await db.products.find_one({'category_id': category_id})
+    """Delete a category.
+
+    The category is kept as a tombstone so delta sync clients learn about the deletion;
+    tombstones are purged by a TTL index once `TOMBSTONE_TTL_SECONDS` have passed.
+    """
+    product = await db.products.find_one(
+        {'owner_id': current_user.id, 'category_id': category_id, 'deleted_at': None},
+        {'_id': 1},
+    )
     if product:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail='Cannot delete category with associated products',
         )
 
-    result = await db.categories.delete_one({'_id': category_id, 'owner_id': str(current_user.id)})
-    if result.deleted_count == 0:
+    subcategory = await db.categories.find_one(
+        {'owner_id': current_user.id, 'path': category_id, '_id': {'$ne': category_id}, 'deleted_at': None},
+        {'_id': 1},
+    )
+    if subcategory:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Cannot delete category with subcategories',
+        )
+
+    now = datetime.now(UTC)
+    async with claim_sequence(db, current_user.id) as seq:
+        deleted = await db.categories.find_one_and_update(
+            {'_id': category_id, 'owner_id': current_user.id, 'deleted_at': None},
+            {'$set': {'deleted_at': now, 'updated_at': now, 'seq': seq}},
+            return_document=ReturnDocument.AFTER,
+        )
+    if deleted is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail='Category not found',
         )
+    deleted_category = Category(**deleted)
+    publish_change(deleted_category)
+    audit('deleted', deleted_category)
     return {'message': 'Category deleted successfully'}
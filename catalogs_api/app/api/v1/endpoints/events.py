@@ -0,0 +1,89 @@
+import asyncio
+from collections.abc import AsyncGenerator
+from typing import Annotated, Any
+
+from bson import ObjectId
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import StreamingResponse
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.api.deps import get_current_user
+from app.core.config import settings
+from app.core.events import broker, format_event
+from app.database.changes import ChangePosition, committed_sequence, fetch_changes
+from app.database.mongodb import get_database
+from app.models import User
+
+router = APIRouter()
+
+
+async def event_stream(
+    db: AsyncIOMotorDatabase[Any],
+    owner_id: ObjectId,
+    last_event_id: ChangePosition | None,
+) -> AsyncGenerator[str, None]:
+    """Yield Server-Sent Events with an owner's catalog changes.
+
+    Published changes and released sequence claims only wake the stream up; the events
+    themselves are read with `fetch_changes`, so they come in sequence order and a change
+    is never sent before one that commits ahead of it. The subscription is opened before
+    anything is read, so no change is missed. Changes after `last_event_id` are replayed
+    first, without it the stream starts at the latest change. A comment is sent as
+    heartbeat whenever the stream has been idle for `EVENTS_HEARTBEAT_SECONDS`, and while
+    changes are held back they are read again after each heartbeat.
+    """
+    subscription = broker.subscribe(owner_id)
+    try:
+        since = last_event_id or ChangePosition(await committed_sequence(db, owner_id) or 0)
+        while True:
+            changes = await fetch_changes(db, owner_id, since, settings.SYNC_PAGE_SIZE)
+            for item in changes.items:
+                yield format_event(item)
+            since = changes.position
+            if changes.has_more:
+                continue
+
+            while True:
+                try:
+                    async with asyncio.timeout(settings.EVENTS_HEARTBEAT_SECONDS):
+                        pending = [await subscription.queue.get()]
+                    break
+                except TimeoutError:
+                    yield ': heartbeat\n\n'
+                    if changes.held_back:
+                        # The write holding changes back may have ended without a wake-up
+                        pending = []
+                        break
+            while not subscription.queue.empty():
+                pending.append(subscription.queue.get_nowait())
+            if None in pending:
+                return
+    finally:
+        broker.unsubscribe(subscription)
+
+
+@router.get('/')
+async def stream_events(
+    db: Annotated[AsyncIOMotorDatabase[Any], Depends(get_database)],
+    current_user: Annotated[User, Depends(get_current_user)],
+    last_event_id: Annotated[str | None, Header()] = None,
+) -> StreamingResponse:
+    """Stream catalog changes for the current user as Server-Sent Events.
+
+    Each event id is the position of the change, so reconnecting clients resume with
+    `Last-Event-ID`.
+    """
+    since = None
+    if last_event_id is not None:
+        try:
+            since = ChangePosition.parse(last_event_id)
+        except ValueError as err:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='Invalid Last-Event-ID',
+            ) from err
+    return StreamingResponse(
+        event_stream(db, current_user.id, since),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
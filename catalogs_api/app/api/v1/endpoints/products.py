@@ -1,16 +1,76 @@
+from datetime import UTC, datetime, timedelta
 from typing import Annotated, Any
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from bson import ObjectId
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
 
 from app.api.deps import get_current_user
+from app.core.config import settings
+from app.core.events import publish_change
+from app.database.changes import claim_sequence
 from app.database.mongodb import get_database
-from app.models import Product, User
-from app.schemas import ProductCreate, ProductUpdate
+from app.database.price_history import downsample, fetch_price_history, record_price, record_prices
+from app.database.write_behind import audit, write_behind
+from app.models import MAX_PRICE, Product, PyObjectId, User, to_minor_units
+from app.schemas import (
+    BulkUpdateResponse,
+    PriceAdjustment,
+    PriceHistoryQuery,
+    PriceHistoryResponse,
+    ProductBulkFilter,
+    ProductBulkUpdate,
+    ProductCreate,
+    ProductUpdate,
+)
 
 router = APIRouter()
 
 
+def round_steps(value: dict[str, Any], rounding: str) -> dict[str, Any]:
+    """Build the aggregation expression rounding a number of price steps to a whole one."""
+    if rounding == 'up':
+        return {'$ceil': value}
+    if rounding == 'down':
+        return {'$floor': value}
+    return {'$floor': {'$add': [value, 0.5]}}
+
+
+def bulk_query(owner_id: ObjectId, bulk_filter: ProductBulkFilter) -> dict[str, Any]:
+    """Build the query selecting the products of a bulk update."""
+    query: dict[str, Any] = {'owner_id': owner_id, 'deleted_at': None}
+    if bulk_filter.category_id is not None:
+        query['category_id'] = bulk_filter.category_id
+    price_range = {}
+    if bulk_filter.min_price is not None:
+        price_range['$gte'] = to_minor_units(bulk_filter.min_price)
+    if bulk_filter.max_price is not None:
+        price_range['$lte'] = to_minor_units(bulk_filter.max_price)
+    if price_range:
+        query['price'] = price_range
+    if bulk_filter.ids is not None:
+        query['_id'] = {'$in': bulk_filter.ids}
+    return query
+
+
+def price_expression(adjustment: PriceAdjustment) -> dict[str, Any]:
+    """Build the aggregation expression computing an adjusted price in minor units.
+
+    The price is scaled in integers to `(price * numerator + offset) / denominator` steps, rounded to a
+    whole number of steps, kept between one step and `MAX_PRICE`, and converted back, so no
+    rounding error creeps in before the final rounding.
+    """
+    step = to_minor_units(adjustment.round_to)
+    if adjustment.mode == 'percentage':
+        numerator, offset, denominator = round((100 + adjustment.value) * 100), 0, 100 * 100 * step
+    else:
+        numerator, offset, denominator = 1, to_minor_units(adjustment.value), step
+    steps = {'$divide': [{'$add': [{'$multiply': ['$price', numerator]}, offset]}, denominator]}
+    steps = {'$min': [MAX_PRICE // step, {'$max': [1, round_steps(steps, adjustment.rounding)]}]}
+    return {'$toLong': {'$multiply': [steps, step]}}
+
+
 @router.post('/')
 async def create_product(
     product_in: ProductCreate,
@@ -18,98 +78,255 @@ async def create_product(
     current_user: Annotated[User, Depends(get_current_user)],
 ) -> Product:
     """Create new product."""
-    category = await db.categories.find_one({'_id': product_in.category_id, 'owner_id': str(current_user.id)})
+    category = await db.categories.find_one(
+        {'_id': product_in.category_id, 'owner_id': current_user.id, 'deleted_at': None}
+    )
     if not category:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail='Category not found',
         )
 
-    product = Product(
-        **product_in.model_dump(),
-        owner_id=str(current_user.id),
-    )
-
-    result = await db.products.insert_one(product.model_dump(by_alias=True))
-    product.id = str(result.inserted_id)
+    async with claim_sequence(db, current_user.id) as seq:
+        product = Product(
+            **product_in.model_dump(exclude={'price'}),
+            price=to_minor_units(product_in.price),
+            owner_id=current_user.id,
+            seq=seq,
+        )
+        result = await db.products.insert_one(product.model_dump(by_alias=True))
+    product.id = result.inserted_id
+    await record_price(db, product)
+    publish_change(product)
+    audit('created', product)
     return product
 
 
+async def publish_updates(
+    db: AsyncIOMotorDatabase[Any],
+    products: list[Product],
+    *,
+    record_price_history: bool,
+) -> None:
+    """Publish and audit a batch of products changed by a bulk update."""
+    if record_price_history:
+        await record_prices(db, products)
+    for product in products:
+        publish_change(product)
+        audit('updated', product)
+
+
+@router.post('/bulk-update')
+async def bulk_update_products(
+    bulk_in: ProductBulkUpdate,
+    db: Annotated[AsyncIOMotorDatabase[Any], Depends(get_database)],
+    current_user: Annotated[User, Depends(get_current_user)],
+) -> BulkUpdateResponse:
+    """Reprice or re-categorize all products matching a filter.
+
+    The change runs server-side as a single `update_many` with an aggregation pipeline, so
+    no product is read into the API first. Only products whose values actually change get
+    a new `seq` and `updated_at`; they are then read back in batches of
+    `BULK_UPDATE_BATCH_SIZE` to publish the changes.
+    """
+    if bulk_in.category_id is not None:
+        category = await db.categories.find_one(
+            {'_id': bulk_in.category_id, 'owner_id': current_user.id, 'deleted_at': None},
+            {'_id': 1},
+        )
+        if not category:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail='Category not found',
+            )
+
+    new_values: dict[str, Any] = {}
+    if bulk_in.price is not None:
+        new_values['price'] = price_expression(bulk_in.price)
+    if bulk_in.category_id is not None:
+        new_values['category_id'] = bulk_in.category_id
+
+    async with claim_sequence(db, current_user.id) as seq:
+        result = await db.products.update_many(
+            bulk_query(current_user.id, bulk_in.filter),
+            [
+                {'$set': {f'__{field}': value for field, value in new_values.items()}},
+                {'$set': {'__changed': {'$or': [{'$ne': [f'$__{field}', f'${field}']} for field in new_values]}}},
+                {
+                    '$set': {
+                        **{field: f'$__{field}' for field in new_values},
+                        'updated_at': {'$cond': ['$__changed', datetime.now(UTC), '$updated_at']},
+                        'seq': {'$cond': ['$__changed', seq, '$seq']},
+                        'content_hash': {'$cond': ['$__changed', None, '$content_hash']},
+                    }
+                },
+                {'$project': {'__changed': 0, **{f'__{field}': 0 for field in new_values}}},
+            ],
+        )
+
+    if result.modified_count:
+        products: list[Product] = []
+        async for document in db.products.find({'owner_id': current_user.id, 'seq': seq, 'deleted_at': None}):
+            products.append(Product(**document))
+            if len(products) == settings.BULK_UPDATE_BATCH_SIZE:
+                await publish_updates(db, products, record_price_history=bulk_in.price is not None)
+                products = []
+        await publish_updates(db, products, record_price_history=bulk_in.price is not None)
+    return BulkUpdateResponse(matched_count=result.matched_count, modified_count=result.modified_count)
+
+
 @router.get('/')
 async def list_products(
     db: Annotated[AsyncIOMotorDatabase[Any], Depends(get_database)],
     current_user: Annotated[User, Depends(get_current_user)],
+    category_subtree: Annotated[PyObjectId | None, Query()] = None,
 ) -> list[Product]:
-    """List all products for current user."""
-    cursor = db.products.find({'owner_id': str(current_user.id)})
+    """List all products for current user.
+
+    With `category_subtree`, only products in that category or any of its descendants
+    are listed. The subtree is resolved with one query on the categories' `path`;
+    categories created before category trees have no stored path and match by `_id`.
+    """
+    query: dict[str, Any] = {'owner_id': current_user.id, 'deleted_at': None}
+    if category_subtree is not None:
+        cursor = db.categories.find(
+            {
+                'owner_id': current_user.id,
+                '$or': [{'_id': category_subtree}, {'path': category_subtree}],
+                'deleted_at': None,
+            },
+            {'_id': 1},
+        )
+        categories = await cursor.to_list(length=None)
+        if not categories:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail='Category not found',
+            )
+        query['category_id'] = {'$in': [category['_id'] for category in categories]}
+
+    cursor = db.products.find(query)
     products = await cursor.to_list(length=None)
     return [Product(**product) for product in products]
 
 
 @router.get('/{product_id}')
 async def get_product(
-    product_id: str,
+    product_id: PyObjectId,
     db: Annotated[AsyncIOMotorDatabase[Any], Depends(get_database)],
     current_user: Annotated[User, Depends(get_current_user)],
 ) -> Product:
-    """Get a specific product."""
-    product = await db.products.find_one({'_id': product_id, 'owner_id': str(current_user.id)})
+    """Get a specific product.
+
+    Views are counted in `product_stats` through the write-behind buffer.
+    """
+    product = await db.products.find_one({'_id': product_id, 'owner_id': current_user.id, 'deleted_at': None})
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail='Product not found',
         )
+    write_behind.update('product_stats', product_id, {'$inc': {'views': 1}, '$set': {'owner_id': current_user.id}})
     return Product(**product)
 
 
-@router.put('/{product_id}')
-async def update_product(
-    product_id: str,
-    product_in: ProductUpdate,
+@router.get('/{product_id}/price-history')
+async def get_price_history(
+    product_id: PyObjectId,
     db: Annotated[AsyncIOMotorDatabase[Any], Depends(get_database)],
     current_user: Annotated[User, Depends(get_current_user)],
-) -> Product:
-    """Update a product."""
-    product = await db.products.find_one({'_id': product_id, 'owner_id': str(current_user.id)})
+    history_in: Annotated[PriceHistoryQuery, Query()],
+) -> PriceHistoryResponse:
+    """Get the price changes of a product, optionally downsampled to one point per interval."""
+    product = await db.products.find_one(
+        {'_id': product_id, 'owner_id': current_user.id, 'deleted_at': None}, {'_id': 1}
+    )
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail='Product not found',
         )
 
+    points = await fetch_price_history(db, current_user.id, product_id, history_in.start, history_in.end)
+    if history_in.interval is not None:
+        points = downsample(points, timedelta(seconds=history_in.interval))
+    return PriceHistoryResponse(product_id=product_id, points=points)
+
+
+@router.put('/{product_id}')
+async def update_product(
+    product_id: PyObjectId,
+    product_in: ProductUpdate,
+    db: Annotated[AsyncIOMotorDatabase[Any], Depends(get_database)],
+    current_user: Annotated[User, Depends(get_current_user)],
+) -> Product:
+    """Update a product.
+
+    Changes are applied with a single `find_one_and_update` returning the previous
+    document, so price changes are detected without another read.
+    """
     update_data = product_in.model_dump(exclude_unset=True)
+    if update_data.get('price') is not None:
+        update_data['price'] = to_minor_units(update_data['price'])
 
     if 'category_id' in update_data:
-        category = await db.categories.find_one({'_id': update_data['category_id'], 'owner_id': str(current_user.id)})
+        category = await db.categories.find_one(
+            {'_id': update_data['category_id'], 'owner_id': current_user.id, 'deleted_at': None},
+            {'_id': 1},
+        )
         if not category:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail='Category not found',
             )
 
+    query = {'_id': product_id, 'owner_id': current_user.id, 'deleted_at': None}
     if update_data:
-        await db.products.update_one({'_id': product_id}, {'$set': update_data})
-
-    updated_product = await db.products.find_one({'_id': product_id})
-    if not updated_product:
+        update_data['updated_at'] = datetime.now(UTC)
+        update_data['content_hash'] = None
+        async with claim_sequence(db, current_user.id) as seq:
+            update_data['seq'] = seq
+            previous = await db.products.find_one_and_update(query, {'$set': update_data})
+        product = {**previous, **update_data} if previous else None
+    else:
+        product = await db.products.find_one(query)
+    if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail='Product not found',
         )
-    return Product(**updated_product)
+    updated = Product(**product)
+    if update_data:
+        if updated.price != previous['price']:
+            await record_price(db, updated)
+        publish_change(updated)
+        audit('updated', updated)
+    return updated
 
 
 @router.delete('/{product_id}')
 async def delete_product(
-    product_id: str,
+    product_id: PyObjectId,
     db: Annotated[AsyncIOMotorDatabase[Any], Depends(get_database)],
     current_user: Annotated[User, Depends(get_current_user)],
 ) -> dict[str, str]:
-    """Delete a product."""
-    result = await db.products.delete_one({'_id': product_id, 'owner_id': str(current_user.id)})
-    if result.deleted_count == 0:
+    """Delete a product.
+
+    The product is kept as a tombstone until the TTL index on `deleted_at` purges it.
+    """
+    now = datetime.now(UTC)
+    async with claim_sequence(db, current_user.id) as seq:
+        deleted = await db.products.find_one_and_update(
+            {'_id': product_id, 'owner_id': current_user.id, 'deleted_at': None},
+            {'$set': {'deleted_at': now, 'updated_at': now, 'seq': seq}},
+            return_document=ReturnDocument.AFTER,
+        )
+    if deleted is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail='Product not found',
         )
+    deleted_product = Product(**deleted)
+    publish_change(deleted_product)
+    audit('deleted', deleted_product)
     return {'message': 'Product deleted successfully'}
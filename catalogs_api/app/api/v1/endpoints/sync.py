@@ -0,0 +1,77 @@
+import base64
+from datetime import UTC, datetime
+from typing import Annotated, Any
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.api.deps import get_current_user
+from app.core.config import settings
+from app.database.changes import ChangePosition, fetch_changes
+from app.database.mongodb import get_database
+from app.models import Category, Product, User
+from app.schemas import SyncDeleted, SyncResponse
+
+router = APIRouter()
+
+
+def encode_sync_token(position: ChangePosition, issued_at: datetime) -> str:
+    """Encode a change position and its issue time into an opaque sync token."""
+    raw = f'{position}:{int(issued_at.timestamp())}'.encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_sync_token(token: str) -> tuple[ChangePosition, datetime]:
+    """Decode a sync token into its change position and issue time.
+
+    Raises:
+        ValueError: If the token is malformed.
+    """
+    position, issued_at = base64.urlsafe_b64decode(token.encode()).decode().split(':')
+    try:
+        return ChangePosition.parse(position), datetime.fromtimestamp(int(issued_at), UTC)
+    except (OverflowError, OSError) as err:
+        raise ValueError('Sync token issue time out of range') from err
+
+
+@router.get('/')
+async def sync(
+    db: Annotated[AsyncIOMotorDatabase[Any], Depends(get_database)],
+    current_user: Annotated[User, Depends(get_current_user)],
+    since: Annotated[str | None, Query()] = None,
+) -> SyncResponse:
+    """Return the catalog changes made since `since`.
+
+    Without a token the whole catalog is returned. Clients keep calling with `next_token`
+    while `has_more` is true. Tokens older than the tombstone TTL are rejected with 410,
+    since deletions made after they were issued may already have been purged.
+    """
+    now = datetime.now(UTC)
+    since_position = None
+    if since is not None:
+        try:
+            since_position, issued_at = decode_sync_token(since)
+        except ValueError as err:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='Invalid sync token',
+            ) from err
+        if (now - issued_at).total_seconds() > settings.TOMBSTONE_TTL_SECONDS:
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE,
+                detail='Sync token expired, a full sync is required',
+            )
+
+    changes = await fetch_changes(db, current_user.id, since_position, settings.SYNC_PAGE_SIZE)
+    live = [item for item in changes.items if item.deleted_at is None]
+    deleted = [item for item in changes.items if item.deleted_at is not None]
+    return SyncResponse(
+        products=[item for item in live if isinstance(item, Product)],
+        categories=[item for item in live if isinstance(item, Category)],
+        deleted=SyncDeleted(
+            products=[item.id for item in deleted if isinstance(item, Product)],
+            categories=[item.id for item in deleted if isinstance(item, Category)],
+        ),
+        next_token=encode_sync_token(changes.position, now),
+        has_more=changes.has_more,
+    )
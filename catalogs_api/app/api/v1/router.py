@@ -1,9 +1,12 @@
 from fastapi import APIRouter
 
-from app.api.v1.endpoints import auth, categories, products
+from app.api.v1.endpoints import auth, catalog, categories, events, products, sync
 
 api_router = APIRouter()
 
 api_router.include_router(auth.router, prefix='/auth', tags=['auth'])
 api_router.include_router(products.router, prefix='/products', tags=['products'])
 api_router.include_router(categories.router, prefix='/categories', tags=['categories'])
+api_router.include_router(sync.router, prefix='/sync', tags=['sync'])
+api_router.include_router(events.router, prefix='/events', tags=['events'])
+api_router.include_router(catalog.router, prefix='/catalog', tags=['catalog'])
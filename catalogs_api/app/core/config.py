@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 
 
@@ -11,6 +13,23 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     MONGODB_URL: str = 'mongodb://catalogs_db:27017'
     DATABASE_NAME: str = 'catalogs_db'
+    TOMBSTONE_TTL_SECONDS: int = 30 * 24 * 60 * 60
+    SYNC_PAGE_SIZE: int = 500
+    SEQUENCE_CLAIM_TIMEOUT_SECONDS: float = 60
+    EVENTS_SOURCE: Literal['local', 'change_stream'] = 'local'
+    EVENTS_HEARTBEAT_SECONDS: float = 15
+    EVENTS_QUEUE_SIZE: int = 100
+    EVENTS_WATCH_RETRY_SECONDS: float = 1
+    EVENTS_WATCH_MAX_RETRY_SECONDS: float = 60
+    PRICE_HISTORY_WINDOW_SECONDS: int = 24 * 60 * 60
+    PRICE_HISTORY_BUCKET_SIZE: int = 200
+    WRITE_BEHIND_FLUSH_SECONDS: float = 1
+    WRITE_BEHIND_FLUSH_SIZE: int = 1000
+    WRITE_BEHIND_MAX_PENDING: int = 100_000
+    MIGRATE_ON_STARTUP: bool = True
+    MIGRATION_BATCH_SIZE: int = 1000
+    CATALOG_BATCH_SIZE: int = 1000
+    BULK_UPDATE_BATCH_SIZE: int = 1000
 
 
 settings = Settings()
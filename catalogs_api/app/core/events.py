@@ -0,0 +1,177 @@
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from typing import Any
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.core.config import settings
+from app.models import Category, Product
+
+logger = logging.getLogger(__name__)
+
+# Server error code for a resume token that has fallen off the oplog
+CHANGE_STREAM_HISTORY_LOST = 286
+
+
+class Subscription:
+    """A subscriber's queue of pending catalog changes.
+
+    An owner id in the queue is a wake-up without a change, and a `None` means the
+    subscription was closed and the stream should end.
+    """
+
+    def __init__(self, owner_id: ObjectId, maxsize: int) -> None:
+        """Initialize the subscription."""
+        self.owner_id = owner_id
+        self.queue: asyncio.Queue[Product | Category | ObjectId | None] = asyncio.Queue(maxsize=maxsize)
+
+    def close(self) -> None:
+        """Drop pending changes and tell the consumer to stop."""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class EventBroker:
+    """In-process pub/sub fanning catalog changes out to each owner's subscribers.
+
+    Subscribers that fall `EVENTS_QUEUE_SIZE` changes behind are evicted instead of
+    buffering without bound; they reconnect with `Last-Event-ID` and replay the
+    missed changes from the database.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the broker."""
+        self._subscriptions: defaultdict[ObjectId, set[Subscription]] = defaultdict(set)
+
+    def subscribe(self, owner_id: ObjectId) -> Subscription:
+        """Subscribe to an owner's changes."""
+        subscription = Subscription(owner_id, settings.EVENTS_QUEUE_SIZE)
+        self._subscriptions[owner_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Remove a subscription."""
+        subscriptions = self._subscriptions.get(subscription.owner_id)
+        if subscriptions is None:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._subscriptions[subscription.owner_id]
+
+    def publish(self, item: Product | Category) -> None:
+        """Send a changed item to its owner's subscribers."""
+        self._deliver(item.owner_id, item)
+
+    def wake(self, owner_id: ObjectId) -> None:
+        """Wake an owner's subscribers up without a change, so they read the database again."""
+        self._deliver(owner_id, owner_id)
+
+    def _deliver(self, owner_id: ObjectId, message: Product | Category | ObjectId) -> None:
+        """Queue a message for an owner's subscribers, evicting those that fell behind."""
+        for subscription in list(self._subscriptions.get(owner_id, ())):
+            try:
+                subscription.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self.unsubscribe(subscription)
+                subscription.close()
+
+    def close(self) -> None:
+        """Close every subscription."""
+        for subscriptions in list(self._subscriptions.values()):
+            for subscription in list(subscriptions):
+                self.unsubscribe(subscription)
+                subscription.close()
+
+
+broker = EventBroker()
+
+
+def publish_change(item: Product | Category) -> None:
+    """Publish a change made by a write handler.
+
+    When changes come from a MongoDB change stream the stream publishes them instead,
+    so handlers don't publish them twice.
+    """
+    if settings.EVENTS_SOURCE == 'local':
+        broker.publish(item)
+
+
+def publish_wake_up(owner_id: ObjectId) -> None:
+    """Wake an owner's subscribers up after a write released its sequence claim.
+
+    Changes committed while the claim was open are held back from readers, and the claim
+    may end without a change of its own, e.g. when the write fails. With a change stream,
+    the stream sees the release itself.
+    """
+    if settings.EVENTS_SOURCE == 'local':
+        broker.wake(owner_id)
+
+
+def format_event(item: Product | Category) -> str:
+    """Format a changed item as a Server-Sent Event, using its change position as the event id."""
+    kind = 'product' if isinstance(item, Product) else 'category'
+    if item.deleted_at is not None:
+        event, data = f'{kind}.deleted', json.dumps({'_id': str(item.id)})
+    else:
+        event, data = f'{kind}.upserted', item.model_dump_json(by_alias=True)
+    return f'id: {item.seq}.{item.id}\nevent: {event}\ndata: {data}\n\n'
+
+
+async def watch_changes(db: AsyncIOMotorDatabase[Any]) -> None:
+    """Publish product and category changes from a MongoDB change stream.
+
+    Requires a replica set. Unlike handler publishing, this also sees changes made by
+    other workers and by direct imports. Released sequence claims wake the owner's
+    subscribers up, since they may let held back changes through. When the stream fails,
+    e.g. on a failover, it is reopened after the last change it delivered, with a delay
+    doubling from `EVENTS_WATCH_RETRY_SECONDS` up to `EVENTS_WATCH_MAX_RETRY_SECONDS`. If
+    that change has already left the oplog the stream restarts at the present;
+    subscribers read their events from the database, so they only miss the wake-ups.
+    """
+    pipeline = [
+        {
+            '$match': {
+                '$or': [
+                    {
+                        'ns.coll': {'$in': ['products', 'categories']},
+                        'operationType': {'$in': ['insert', 'update', 'replace']},
+                    },
+                    # Claims only change `seq` when they are taken
+                    {
+                        'ns.coll': 'change_counters',
+                        'operationType': 'update',
+                        'updateDescription.updatedFields.seq': {'$exists': False},
+                    },
+                ]
+            }
+        }
+    ]
+    resume_token = None
+    delay = settings.EVENTS_WATCH_RETRY_SECONDS
+    while True:
+        try:
+            async with db.watch(pipeline, full_document='updateLookup', resume_after=resume_token) as stream:
+                async for change in stream:
+                    resume_token = stream.resume_token
+                    delay = settings.EVENTS_WATCH_RETRY_SECONDS
+                    if change['ns']['coll'] == 'change_counters':
+                        broker.wake(change['documentKey']['_id'])
+                        continue
+                    document = change.get('fullDocument')
+                    if document is None:
+                        continue
+                    broker.publish(Product(**document) if change['ns']['coll'] == 'products' else Category(**document))
+            # The stream only ends when invalidated, e.g. by dropping the database, and
+            # cannot be resumed past that
+            resume_token = None
+        except PyMongoError as err:
+            if isinstance(err, OperationFailure) and err.code == CHANGE_STREAM_HISTORY_LOST:
+                resume_token = None
+            logger.exception('Change stream failed, reopening in %.1f seconds', delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, settings.EVENTS_WATCH_MAX_RETRY_SECONDS)
@@ -0,0 +1,31 @@
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.database.instrumentation import CommandStats, command_stats
+
+
+class ServerTimingMiddleware:
+    """Report the MongoDB commands issued by each request in a `Server-Timing` header."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        """Initialize the middleware."""
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Collect command stats for the request and add them to the response headers."""
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        stats = CommandStats()
+        token = command_stats.set(stats)
+
+        async def send_with_server_timing(message: Message) -> None:
+            if message['type'] == 'http.response.start':
+                MutableHeaders(scope=message).append('Server-Timing', stats.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_server_timing)
+        finally:
+            command_stats.reset(token)
@@ -0,0 +1,273 @@
+import hashlib
+import json
+from collections import defaultdict
+from datetime import UTC, datetime
+from typing import Any
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import InsertOne, UpdateOne
+
+from app.core.config import settings
+from app.core.events import publish_change
+from app.database.categories import move_descendants
+from app.database.changes import claim_sequence
+from app.database.price_history import record_prices
+from app.database.write_behind import audit
+from app.models import Category, Product, to_minor_units
+from app.schemas import CatalogCategory, CatalogProduct, CatalogSyncCounts
+
+# Fields covered by the content hash; everything else is bookkeeping
+HASHED_FIELDS = {
+    'categories': {'name', 'description', 'parent_id', 'path'},
+    'products': {'name', 'description', 'price', 'category_id'},
+}
+
+
+def content_hash(item: Category | Product) -> str:
+    """Hash the catalog-managed content of a category or product."""
+    collection = 'products' if isinstance(item, Product) else 'categories'
+    content = item.model_dump(include=HASHED_FIELDS[collection])
+    return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class CatalogSync:
+    """Bring an owner's catalog to a desired state with the fewest writes.
+
+    Items are matched to stored documents by `external_id`. Stored documents keep a hash
+    of their content, so an unchanged item is recognized without a write; every other
+    write path clears the hash, so an item edited through the API is written again. New
+    and changed items are written with batched `bulk_write` calls, and `finish` soft
+    deletes the documents missing from the desired state. Documents without an
+    `external_id` are not managed by the catalog and are left alone.
+
+    Items are applied as they arrive: categories must come before products, and parent
+    categories before their children.
+    """
+
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase[Any],
+        owner_id: ObjectId,
+        batch_size: int = settings.CATALOG_BATCH_SIZE,
+    ) -> None:
+        """Initialize the sync for an owner."""
+        self.db = db
+        self.owner_id = owner_id
+        self.batch_size = batch_size
+        self.counts = {'categories': CatalogSyncCounts(), 'products': CatalogSyncCounts()}
+        self._stored: dict[str, dict[str, dict[str, Any]]] = {}
+        self._categories: dict[str, Category] = {}
+        self._products: set[str] = set()
+        self._pending: defaultdict[str, list[tuple[Category | Product, dict[str, Any] | None]]] = defaultdict(list)
+        self._moved: list[tuple[Category, list[ObjectId]]] = []
+
+    async def load(self) -> None:
+        """Load the external ids and content hashes of the stored catalog."""
+        for collection in ('categories', 'products'):
+            cursor = self.db[collection].find(
+                {'owner_id': self.owner_id, 'external_id': {'$ne': None}, 'deleted_at': None},
+                {'external_id': 1, 'content_hash': 1, 'created_at': 1, 'price': 1, 'path': 1},
+            )
+            self._stored[collection] = {document['external_id']: document for document in await cursor.to_list(None)}
+
+    async def apply_category(self, item: CatalogCategory) -> None:
+        """Apply the desired state of a category.
+
+        Raises:
+            ValueError: If the category is out of order or appears twice.
+        """
+        if self._products:
+            raise ValueError('Categories must come before products')
+        if item.external_id in self._categories:
+            msg = f'Duplicate category {item.external_id!r}'
+            raise ValueError(msg)
+        parent = None
+        if item.parent_external_id is not None:
+            parent = self._categories.get(item.parent_external_id)
+            if parent is None:
+                msg = f'Unknown parent category {item.parent_external_id!r}'
+                raise ValueError(msg)
+
+        stored = self._stored['categories'].get(item.external_id)
+        category = Category(
+            **self._identity(stored),
+            name=item.name,
+            description=item.description,
+            owner_id=self.owner_id,
+            parent_id=parent.id if parent else None,
+            external_id=item.external_id,
+        )
+        if parent is not None:
+            category.path = [*parent.path, category.id]
+        self._categories[item.external_id] = category
+        await self._stage('categories', category, stored)
+
+    async def apply_product(self, item: CatalogProduct) -> None:
+        """Apply the desired state of a product.
+
+        Raises:
+            ValueError: If the product's category is unknown or the product appears twice.
+        """
+        if item.external_id in self._products:
+            msg = f'Duplicate product {item.external_id!r}'
+            raise ValueError(msg)
+        category = self._categories.get(item.category_external_id)
+        if category is None:
+            msg = f'Unknown category {item.category_external_id!r}'
+            raise ValueError(msg)
+        if not self._products:
+            await self._flush('categories')
+        self._products.add(item.external_id)
+
+        stored = self._stored['products'].get(item.external_id)
+        product = Product(
+            **self._identity(stored),
+            name=item.name,
+            description=item.description,
+            price=to_minor_units(item.price),
+            category_id=category.id,
+            owner_id=self.owner_id,
+            external_id=item.external_id,
+        )
+        await self._stage('products', product, stored)
+
+    async def flush(self) -> None:
+        """Write the changes staged so far, without deleting anything.
+
+        Categories created through the API below moved catalog categories are moved along.
+        """
+        await self._flush('categories')
+        await self._flush('products')
+        await self._move_descendants()
+
+    async def finish(self) -> None:
+        """Write the remaining changes and delete the items missing from the desired state.
+
+        Products are deleted before categories, each batch with a single `update_many`.
+        Like `DELETE /categories/{id}`, categories that still hold live products or
+        subcategories, e.g. ones created through the API, are not deleted.
+        """
+        await self.flush()
+        for collection, wanted in (('products', self._products), ('categories', self._categories.keys())):
+            missing = [document['_id'] for key, document in self._stored[collection].items() if key not in wanted]
+            if collection == 'categories' and missing:
+                missing = await self._unused(missing)
+            for start in range(0, len(missing), self.batch_size):
+                await self._delete(collection, missing[start : start + self.batch_size])
+
+    async def _unused(self, category_ids: list[ObjectId]) -> list[ObjectId]:
+        """Leave out the categories with live products or live subcategories that are kept."""
+        paths = {
+            document['_id']: document.get('path', [document['_id']])
+            for document in self._stored['categories'].values()
+        }
+        used = await self.db.products.distinct(
+            'category_id',
+            {'owner_id': self.owner_id, 'category_id': {'$in': category_ids}, 'deleted_at': None},
+        )
+        in_use = {ancestor for category_id in used for ancestor in paths[category_id]}
+        in_use.update(
+            await self.db.categories.distinct(
+                'path',
+                {
+                    'owner_id': self.owner_id,
+                    'path': {'$in': category_ids},
+                    '_id': {'$nin': category_ids},
+                    'deleted_at': None,
+                },
+            )
+        )
+        return [category_id for category_id in category_ids if category_id not in in_use]
+
+    @staticmethod
+    def _identity(stored: dict[str, Any] | None) -> dict[str, Any]:
+        """Keep the id and creation time of an already stored item."""
+        return {'_id': stored['_id'], 'created_at': stored['created_at']} if stored else {}
+
+    async def _stage(self, collection: str, item: Category | Product, stored: dict[str, Any] | None) -> None:
+        """Queue an item for writing unless its content hash is unchanged."""
+        item.content_hash = content_hash(item)
+        if stored is not None and stored.get('content_hash') == item.content_hash:
+            self.counts[collection].unchanged += 1
+            return
+        self._pending[collection].append((item, stored))
+        if len(self._pending[collection]) >= self.batch_size:
+            await self._flush(collection)
+
+    async def _flush(self, collection: str) -> None:
+        """Write the queued items of a collection with one `bulk_write`.
+
+        A batch shares one sequence number, so sync pages never split it.
+        """
+        pending, self._pending[collection] = self._pending[collection], []
+        if not pending:
+            return
+        now = datetime.now(UTC)
+        async with claim_sequence(self.db, self.owner_id) as seq:
+            requests: list[InsertOne[Any] | UpdateOne] = []
+            for item, stored in pending:
+                item.seq = seq
+                item.updated_at = now
+                if stored is None:
+                    requests.append(InsertOne(item.model_dump(by_alias=True)))
+                else:
+                    requests.append(
+                        UpdateOne(
+                            {'_id': item.id, 'owner_id': self.owner_id},
+                            {'$set': item.model_dump(exclude={'id', 'owner_id', 'created_at'})},
+                        )
+                    )
+            await self.db[collection].bulk_write(requests, ordered=False)
+
+        self._moved.extend(
+            (item, stored.get('path', [stored['_id']]))
+            for item, stored in pending
+            if isinstance(item, Category) and stored is not None and stored.get('path', [stored['_id']]) != item.path
+        )
+        counts = self.counts[collection]
+        counts.inserted += sum(stored is None for _, stored in pending)
+        counts.updated += sum(stored is not None for _, stored in pending)
+        await record_prices(
+            self.db,
+            [
+                item
+                for item, stored in pending
+                if isinstance(item, Product) and (stored is None or stored['price'] != item.price)
+            ],
+        )
+        for item, stored in pending:
+            publish_change(item)
+            audit('created' if stored is None else 'updated', item)
+
+    async def _move_descendants(self) -> None:
+        """Rewrite the paths of the categories not managed by the catalog below moved ones.
+
+        Each moved category takes one `update_many`, the deepest first, so that descendants
+        of several moved categories end up below the innermost one.
+        """
+        moves, self._moved = self._moved, []
+        if not moves:
+            return
+        now = datetime.now(UTC)
+        async with claim_sequence(self.db, self.owner_id) as seq:
+            for category, old_path in sorted(moves, key=lambda move: len(move[1]), reverse=True):
+                moved = category.model_copy(update={'updated_at': now, 'seq': seq})
+                await move_descendants(self.db, moved, old_path, unmanaged_only=True)
+        async for document in self.db.categories.find({'owner_id': self.owner_id, 'seq': seq}):
+            publish_change(Category(**document))
+
+    async def _delete(self, collection: str, ids: list[ObjectId]) -> None:
+        """Soft delete a batch of items, keeping tombstones for delta sync."""
+        now = datetime.now(UTC)
+        async with claim_sequence(self.db, self.owner_id) as seq:
+            result = await self.db[collection].update_many(
+                {'_id': {'$in': ids}, 'owner_id': self.owner_id, 'deleted_at': None},
+                {'$set': {'deleted_at': now, 'updated_at': now, 'seq': seq}},
+            )
+        self.counts[collection].deleted += result.modified_count
+        model = Product if collection == 'products' else Category
+        for document in await self.db[collection].find({'owner_id': self.owner_id, 'seq': seq}).to_list(None):
+            deleted = model(**document)
+            publish_change(deleted)
+            audit('deleted', deleted)
@@ -0,0 +1,48 @@
+from typing import Any
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.models import Category
+
+# `$slice` needs an element count, this one keeps everything after the position
+MAX_INT32 = 2**31 - 1
+
+
+def descendants_of(owner_id: ObjectId, category_id: ObjectId) -> dict[str, Any]:
+    """Build the query matching the live descendants of a category."""
+    return {'owner_id': owner_id, 'path': category_id, '_id': {'$ne': category_id}, 'deleted_at': None}
+
+
+async def move_descendants(
+    db: AsyncIOMotorDatabase[Any],
+    category: Category,
+    old_path: list[ObjectId],
+    *,
+    unmanaged_only: bool = False,
+) -> None:
+    """Rewrite the paths of a moved category's descendants with a single `update_many`.
+
+    Only descendants whose path still starts with `old_path` are rewritten, so moves of
+    nested categories compose when the deepest one is applied first. With
+    `unmanaged_only`, categories managed by the catalog are left alone.
+    """
+    query = {
+        **descendants_of(category.owner_id, category.id),
+        **{f'path.{index}': category_id for index, category_id in enumerate(old_path)},
+    }
+    if unmanaged_only:
+        query['external_id'] = None
+    await db.categories.update_many(
+        query,
+        [
+            {
+                '$set': {
+                    'path': {'$concatArrays': [category.path, {'$slice': ['$path', len(old_path), MAX_INT32]}]},
+                    'updated_at': category.updated_at,
+                    'seq': category.seq,
+                    'content_hash': None,
+                }
+            }
+        ],
+    )
@@ -0,0 +1,188 @@
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, ReturnDocument
+
+from app.core.config import settings
+from app.core.events import publish_wake_up
+from app.database.price_history import as_utc
+from app.models import Category, Product
+
+
+@dataclass(frozen=True)
+class ChangePosition:
+    """Position in an owner's change log, after sequence number `seq`.
+
+    Set-based writes give many items the same sequence number, so with `id` the position
+    is inside that sequence number, after the item with this id; changes are ordered by
+    `(seq, _id)`. Positions are formatted as `seq` or `seq.id`.
+    """
+
+    seq: int = 0
+    id: ObjectId | None = None
+
+    def __str__(self) -> str:
+        """Format the position."""
+        return str(self.seq) if self.id is None else f'{self.seq}.{self.id}'
+
+    @classmethod
+    def parse(cls, value: str) -> 'ChangePosition':
+        """Parse a formatted position.
+
+        Raises:
+            ValueError: If the position is malformed.
+        """
+        seq, _, item_id = value.partition('.')
+        try:
+            return cls(int(seq), ObjectId(item_id) if item_id else None)
+        except InvalidId as err:
+            raise ValueError(str(err)) from err
+
+
+@dataclass
+class ChangeSet:
+    """Changes to an owner's catalog after a given position, ordered by `(seq, _id)`.
+
+    Deleted items are tombstones, i.e. they have `deleted_at` set. `held_back` tells that
+    changes may be waiting behind writes that are still running.
+    """
+
+    items: list[Product | Category] = field(default_factory=list)
+    position: ChangePosition = field(default_factory=ChangePosition)
+    has_more: bool = False
+    held_back: bool = False
+
+
+@asynccontextmanager
+async def claim_sequence(db: AsyncIOMotorDatabase[Any], owner_id: ObjectId) -> AsyncIterator[int]:
+    """Allocate the next change sequence number for an owner, for the duration of a write.
+
+    Sequence numbers are shared by products and categories, so a single number orders
+    every change in an owner's catalog. They are allocated before the write they number,
+    so concurrent writes can commit out of order; each open claim is kept on the counter
+    until its write ends, and `committed_sequence` keeps readers behind the lowest one.
+    Claims older than `SEQUENCE_CLAIM_TIMEOUT_SECONDS` are dropped by the next claim.
+    """
+    now = datetime.now(UTC)
+    expired = now - timedelta(seconds=settings.SEQUENCE_CLAIM_TIMEOUT_SECONDS)
+    counter = await db.change_counters.find_one_and_update(
+        {'_id': owner_id},
+        [
+            {'$set': {'seq': {'$add': [{'$ifNull': ['$seq', 0]}, 1]}}},
+            {
+                '$set': {
+                    'claims': {
+                        '$concatArrays': [
+                            {
+                                '$filter': {
+                                    'input': {'$ifNull': ['$claims', []]},
+                                    'cond': {'$gt': ['$$this.at', expired]},
+                                }
+                            },
+                            # `$map` evaluates the new claim's fields against the incremented `seq`
+                            {'$map': {'input': [0], 'in': {'seq': '$seq', 'at': now}}},
+                        ]
+                    }
+                }
+            },
+        ],
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    seq = int(counter['seq'])
+    try:
+        yield seq
+    finally:
+        counter = await db.change_counters.find_one_and_update(
+            {'_id': owner_id},
+            {'$pull': {'claims': {'seq': seq}}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if counter is not None and counter['seq'] > seq:
+            # Later writes may have committed behind this claim
+            publish_wake_up(owner_id)
+
+
+async def sequence_bounds(db: AsyncIOMotorDatabase[Any], owner_id: ObjectId) -> tuple[int, int] | None:
+    """Get the sequence number up to which every write of an owner has finished, and the latest one.
+
+    The first is just below the lowest open claim. Claims open for longer than
+    `SEQUENCE_CLAIM_TIMEOUT_SECONDS` are taken to belong to a crashed worker and ignored,
+    without affecting the others. Owners without a counter never claimed a sequence
+    number, so nothing bounds their changes.
+    """
+    counter = await db.change_counters.find_one({'_id': owner_id})
+    if counter is None:
+        return None
+    expired = datetime.now(UTC) - timedelta(seconds=settings.SEQUENCE_CLAIM_TIMEOUT_SECONDS)
+    open_claims = [claim['seq'] for claim in counter.get('claims', []) if as_utc(claim['at']) > expired]
+    latest = int(counter['seq'])
+    return (min(open_claims) - 1 if open_claims else latest), latest
+
+
+async def committed_sequence(db: AsyncIOMotorDatabase[Any], owner_id: ObjectId) -> int | None:
+    """Get the sequence number up to which every write of an owner has finished."""
+    bounds = await sequence_bounds(db, owner_id)
+    return bounds[0] if bounds else None
+
+
+def after(position: ChangePosition) -> dict[str, Any]:
+    """Build the query matching the changes after a position."""
+    if position.id is None:
+        return {'seq': {'$gt': position.seq}}
+    # Documents from before delta sync have no `seq` and sort as 0
+    tie = position.seq or {'$in': [0, None]}
+    return {'$or': [{'seq': {'$gt': position.seq}}, {'seq': tie, '_id': {'$gt': position.id}}]}
+
+
+async def fetch_changes(
+    db: AsyncIOMotorDatabase[Any],
+    owner_id: ObjectId,
+    since: ChangePosition | None,
+    limit: int,
+) -> ChangeSet:
+    """Fetch up to `limit` changes made after `since`, oldest first.
+
+    Without `since` this is a full sync, so tombstones are left out and documents written
+    before delta sync, which have no `seq`, are included. Changes numbered after a write
+    that is still running are held back until it finishes, so a client that has seen a
+    sequence number has seen every change before it. Pages end after exactly `limit`
+    items, even inside the changes of a set-based write.
+    """
+    bounds = await sequence_bounds(db, owner_id)
+    committed = bounds[0] if bounds else None
+    query: dict[str, Any] = {'owner_id': owner_id}
+    if since is None:
+        query['deleted_at'] = None
+        if committed is not None:
+            query['seq'] = {'$not': {'$gt': committed}}
+    else:
+        query.update(after(since))
+        if committed is not None:
+            query = {'$and': [query, {'seq': {'$lte': committed}}]}
+
+    items: list[Product | Category] = []
+    for collection, model in (('products', Product), ('categories', Category)):
+        cursor = db[collection].find(query).sort([('seq', ASCENDING), ('_id', ASCENDING)]).limit(limit + 1)
+        items.extend(model(**document) for document in await cursor.to_list(length=None))
+    items.sort(key=lambda item: (item.seq, item.id))
+
+    changes = ChangeSet(
+        items=items[:limit],
+        position=since or ChangePosition(),
+        has_more=len(items) > limit,
+        held_back=bounds is not None and bounds[0] < bounds[1],
+    )
+    if changes.has_more:
+        changes.position = ChangePosition(changes.items[-1].seq, changes.items[-1].id)
+    elif committed is not None:
+        changes.position = ChangePosition(max(changes.position.seq, committed))
+    elif changes.items:
+        changes.position = ChangePosition(changes.items[-1].seq)
+    return changes
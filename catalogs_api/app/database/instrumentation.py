@@ -0,0 +1,111 @@
+import inspect
+import time
+from collections.abc import Awaitable, Callable
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Self
+
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorCursor, AsyncIOMotorLatentCommandCursor
+
+
+@dataclass
+class CommandStats:
+    """Number and total duration of the MongoDB commands issued while handling a request."""
+
+    count: int = 0
+    duration: float = 0.0
+
+    def server_timing(self) -> str:
+        """Format the stats as a `Server-Timing` header value."""
+        return f'mongo;dur={self.duration * 1000:.3f};desc="{self.count} commands"'
+
+
+command_stats: ContextVar[CommandStats | None] = ContextVar('command_stats', default=None)
+
+
+async def timed[T](awaitable: Awaitable[T]) -> T:
+    """Await a MongoDB command, adding it to the current request's stats."""
+    started = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        stats = command_stats.get()
+        if stats is not None:
+            stats.count += 1
+            stats.duration += time.perf_counter() - started
+
+
+def instrument(method: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap a database, collection or cursor method so the commands it issues are recorded."""
+
+    def wrapper(*args: Any, **kwargs: Any) -> Any:  # noqa: ANN401
+        result = method(*args, **kwargs)
+        if inspect.isawaitable(result):
+            return timed(result)
+        if isinstance(result, AsyncIOMotorCursor | AsyncIOMotorLatentCommandCursor):
+            return InstrumentedCursor(result)
+        return result
+
+    return wrapper
+
+
+class InstrumentedCursor:
+    """Cursor proxy recording the commands issued when results are fetched."""
+
+    def __init__(self, cursor: Any) -> None:  # noqa: ANN401
+        """Initialize the proxy."""
+        self._cursor = cursor
+        self._started = False
+
+    def __getattr__(self, name: str) -> Any:  # noqa: ANN401
+        """Proxy cursor attributes, keeping chained cursors instrumented."""
+        attribute = getattr(self._cursor, name)
+        return instrument(attribute) if callable(attribute) else attribute
+
+    def __aiter__(self) -> Self:
+        """Iterate over the results with `async for`, which bypasses `__getattr__`."""
+        return self
+
+    async def __anext__(self) -> Any:  # noqa: ANN401
+        """Get the next document, recording a command whenever a batch has to be fetched.
+
+        Cursors that don't expose their buffer, like test doubles, count as one fetch.
+        """
+        buffer_size = getattr(self._cursor, '_buffer_size', None)
+        fetches_batch = not self._started if buffer_size is None else buffer_size() == 0 and self._cursor.alive
+        self._started = True
+        if fetches_batch:
+            return await timed(self._cursor.next())
+        return await self._cursor.next()
+
+
+class InstrumentedCollection:
+    """Collection proxy recording every command it issues."""
+
+    def __init__(self, collection: Any) -> None:  # noqa: ANN401
+        """Initialize the proxy."""
+        self._collection = collection
+
+    def __getattr__(self, name: str) -> Any:  # noqa: ANN401
+        """Proxy collection attributes."""
+        attribute = getattr(self._collection, name)
+        return instrument(attribute) if callable(attribute) else attribute
+
+
+class InstrumentedDatabase:
+    """Database proxy handing out instrumented collections."""
+
+    def __init__(self, database: Any) -> None:  # noqa: ANN401
+        """Initialize the proxy."""
+        self._database = database
+
+    def __getattr__(self, name: str) -> Any:  # noqa: ANN401
+        """Proxy database attributes, instrumenting collections and commands."""
+        attribute = getattr(self._database, name)
+        if isinstance(attribute, AsyncIOMotorCollection):
+            return InstrumentedCollection(attribute)
+        return instrument(attribute) if callable(attribute) else attribute
+
+    def __getitem__(self, name: str) -> InstrumentedCollection:
+        """Get an instrumented collection."""
+        return InstrumentedCollection(self._database[name])
@@ -0,0 +1,185 @@
+import argparse
+import asyncio
+import time
+from datetime import UTC, datetime
+from typing import Any
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo.errors import BulkWriteError
+
+from app.core.config import settings
+from app.models import to_minor_units
+
+COMPACT_SCHEMA = 'compact_schema'
+DUPLICATE_KEY_ERROR = 11000
+
+# Collections converted by the compact schema migration, with their ObjectId reference fields
+COMPACT_SCHEMA_COLLECTIONS: dict[str, tuple[str, ...]] = {
+    'users': (),
+    'categories': ('owner_id',),
+    'products': ('owner_id', 'category_id'),
+}
+
+
+# Collections whose documents carry the change tracking fields used by delta sync
+CHANGE_TRACKED_COLLECTIONS = {'categories', 'products'}
+
+
+def compact_document(
+    document: dict[str, Any],
+    reference_fields: tuple[str, ...],
+    *,
+    track_changes: bool = False,
+) -> dict[str, Any]:
+    """Convert a document's string ids to ObjectIds and its float price to minor units.
+
+    With `track_changes`, documents written before delta sync also get a `seq` of 0 and
+    an `updated_at` defaulting to their creation time.
+    """
+    compacted = {**document, '_id': ObjectId(document['_id'])}
+    for field in reference_fields:
+        if isinstance(compacted.get(field), str) and ObjectId.is_valid(compacted[field]):
+            compacted[field] = ObjectId(compacted[field])
+    if isinstance(compacted.get('price'), float):
+        compacted['price'] = to_minor_units(compacted['price'])
+    if track_changes:
+        compacted.setdefault('seq', 0)
+        compacted.setdefault('updated_at', compacted.get('created_at', datetime.now(UTC)))
+    return compacted
+
+
+async def migrate_collection(
+    db: AsyncIOMotorDatabase[Any],
+    name: str,
+    reference_fields: tuple[str, ...],
+    batch_size: int,
+) -> int:
+    """Convert the documents of a collection that still have a string `_id`.
+
+    `_id` is immutable, so each batch inserts the converted documents and only then
+    deletes the originals. Only unconverted documents are selected, which makes the
+    migration resumable: after an interruption, converted copies that already exist
+    are reported as duplicates and their originals deleted on the next run.
+
+    Returns:
+        The number of converted documents.
+    """
+    converted = 0
+    last_id = ''
+    while True:
+        query = {'_id': {'$type': 'string', '$gt': last_id}}
+        batch = await db[name].find(query).sort('_id').limit(batch_size).to_list(length=None)
+        if not batch:
+            return converted
+        last_id = batch[-1]['_id']
+
+        documents = [
+            compact_document(document, reference_fields, track_changes=name in CHANGE_TRACKED_COLLECTIONS)
+            for document in batch
+            if ObjectId.is_valid(document['_id'])
+        ]
+        if not documents:
+            continue
+        try:
+            await db[name].insert_many(documents, ordered=False)
+        except BulkWriteError as err:
+            if any(error['code'] != DUPLICATE_KEY_ERROR for error in err.details['writeErrors']):
+                raise
+        await db[name].delete_many({'_id': {'$in': [str(document['_id']) for document in documents]}})
+        converted += len(documents)
+
+
+async def migrate_change_counters(db: AsyncIOMotorDatabase[Any]) -> int:
+    """Key the change counters by ObjectId owner ids.
+
+    Owners that wrote while the migration was running already have a new counter, so
+    the old value is merged with `$max` to keep their sequence numbers increasing.
+
+    Returns:
+        The number of converted counters.
+    """
+    counters = await db.change_counters.find({'_id': {'$type': 'string'}}).to_list(length=None)
+    converted = 0
+    for counter in counters:
+        if not ObjectId.is_valid(counter['_id']):
+            continue
+        await db.change_counters.update_one(
+            {'_id': ObjectId(counter['_id'])},
+            {'$max': {'seq': counter['seq']}},
+            upsert=True,
+        )
+        await db.change_counters.delete_one({'_id': counter['_id']})
+        converted += 1
+    return converted
+
+
+async def migrate_compact_schema(db: AsyncIOMotorDatabase[Any], batch_size: int | None = None) -> dict[str, int]:
+    """Move stored ids to native ObjectIds and prices to integer minor units.
+
+    Runs in batches of `MIGRATION_BATCH_SIZE` documents and records its completion in
+    the `migrations` collection, so later startups skip it. Documents are invisible to
+    the API until their batch is converted, so the migration has to finish before the API
+    serves traffic: the app runs it at startup, before accepting requests, unless
+    `MIGRATE_ON_STARTUP` is off.
+
+    Returns:
+        The number of converted documents per collection.
+    """
+    if await db.migrations.find_one({'_id': COMPACT_SCHEMA}):
+        return {}
+
+    converted = {
+        name: await migrate_collection(db, name, reference_fields, batch_size or settings.MIGRATION_BATCH_SIZE)
+        for name, reference_fields in COMPACT_SCHEMA_COLLECTIONS.items()
+    }
+    converted['change_counters'] = await migrate_change_counters(db)
+    await db.migrations.insert_one({'_id': COMPACT_SCHEMA, 'completed_at': datetime.now(UTC), 'converted': converted})
+    return converted
+
+
+async def storage_report(db: AsyncIOMotorDatabase[Any]) -> dict[str, dict[str, float]]:
+    """Collect storage statistics and a sample query latency for each migrated collection."""
+    report = {}
+    for name in COMPACT_SCHEMA_COLLECTIONS:
+        stats = await db.command('collStats', name)
+        document = await db[name].find_one({'owner_id': {'$exists': True}})
+        started = time.perf_counter()
+        if document is not None:
+            await db[name].find({'owner_id': document['owner_id']}).to_list(length=None)
+        report[name] = {
+            'count': stats.get('count', 0),
+            'avg_obj_size': stats.get('avgObjSize', 0),
+            'storage_size': stats.get('storageSize', 0),
+            'total_index_size': stats.get('totalIndexSize', 0),
+            'owner_query_ms': (time.perf_counter() - started) * 1000,
+        }
+    return report
+
+
+def print_report(before: dict[str, dict[str, float]], after: dict[str, dict[str, float]]) -> None:
+    """Print before and after storage statistics side by side."""
+    for name, stats in before.items():
+        print(name)  # noqa: T201
+        for metric, value in stats.items():
+            print(f'  {metric:<18} {value:>14.2f} -> {after[name][metric]:>14.2f}')  # noqa: T201
+
+
+async def main() -> None:
+    """Run the compact schema migration from the command line."""
+    parser = argparse.ArgumentParser(description='Migrate stored ids to ObjectIds and prices to minor units.')
+    parser.add_argument('--batch-size', type=int, default=settings.MIGRATION_BATCH_SIZE)
+    parser.add_argument('--report', action='store_true', help='print storage and latency before and after')
+    args = parser.parse_args()
+
+    client: AsyncIOMotorClient[Any] = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[settings.DATABASE_NAME]
+    before = await storage_report(db) if args.report else {}
+    print(await migrate_compact_schema(db, args.batch_size))  # noqa: T201
+    if args.report:
+        print_report(before, await storage_report(db))
+    client.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -1,8 +1,10 @@
-from typing import Any
+from typing import Any, cast
 
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import ASCENDING
 
 from app.core.config import settings
+from app.database.instrumentation import InstrumentedDatabase
 
 
 class MongoDB:
@@ -15,10 +17,10 @@ db = MongoDB()
 
 
 async def get_database() -> AsyncIOMotorDatabase[Any]:
-    """Get the database."""
+    """Get the database, instrumented to record the commands each request issues."""
     if db.client is None:
         raise RuntimeError('Database is not initialized')
-    return db.client[settings.DATABASE_NAME]
+    return cast(AsyncIOMotorDatabase[Any], InstrumentedDatabase(db.client[settings.DATABASE_NAME]))
 
 
 async def connect_to_mongo() -> None:
@@ -32,3 +34,24 @@ async def close_mongo_connection() -> None:
     if db.client is not None:
         db.client.close()
         db.client = None
+
+
+async def create_indexes(database: AsyncIOMotorDatabase[Any]) -> None:
+    """Create the indexes the API relies on.
+
+    Products and categories are paged by `(owner_id, seq, _id)` for delta sync, and tombstones
+    are purged by a TTL index on `deleted_at` (documents without it never expire).
+    `(owner_id, category_id)` serves category product lookups, and the multikey
+    `(owner_id, path)` index resolves a category subtree in one query. Price history
+    buckets are read by product and window start, and catalog upserts match documents by
+    `(owner_id, external_id)`.
+    """
+    for collection in (database.products, database.categories):
+        await collection.create_index([('owner_id', ASCENDING), ('seq', ASCENDING), ('_id', ASCENDING)])
+        await collection.create_index([('owner_id', ASCENDING), ('external_id', ASCENDING)])
+        await collection.create_index('deleted_at', expireAfterSeconds=settings.TOMBSTONE_TTL_SECONDS)
+    await database.products.create_index([('owner_id', ASCENDING), ('category_id', ASCENDING)])
+    await database.categories.create_index([('owner_id', ASCENDING), ('path', ASCENDING)])
+    await database.price_history.create_index(
+        [('owner_id', ASCENDING), ('product_id', ASCENDING), ('start', ASCENDING)]
+    )
@@ -0,0 +1,112 @@
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+from app.core.config import settings
+from app.models import PricePoint, Product
+
+EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+
+
+def as_utc(value: datetime) -> datetime:
+    """Treat naive datetimes read from MongoDB as UTC."""
+    return value if value.tzinfo is not None else value.replace(tzinfo=UTC)
+
+
+def window_start(at: datetime, window: timedelta) -> datetime:
+    """Get the start of the time window containing `at`."""
+    return EPOCH + (as_utc(at) - EPOCH) // window * window
+
+
+def bucket_update(product: Product) -> tuple[dict[str, Any], dict[str, Any]]:
+    """Build the filter and update appending a product's current price to its bucket.
+
+    Changes are pushed into one bucket document per product and time window. A bucket
+    holds at most `PRICE_HISTORY_BUCKET_SIZE` changes; once full, the filter stops
+    matching it and the upsert opens another bucket for the same window.
+    """
+    window = timedelta(seconds=settings.PRICE_HISTORY_WINDOW_SECONDS)
+    return (
+        {
+            'owner_id': product.owner_id,
+            'product_id': product.id,
+            'start': window_start(product.updated_at, window),
+            'count': {'$lt': settings.PRICE_HISTORY_BUCKET_SIZE},
+        },
+        {
+            '$push': {'prices': {'at': product.updated_at, 'price': product.price}},
+            '$inc': {'count': 1},
+            '$min': {'min_price': product.price},
+            '$max': {'max_price': product.price},
+        },
+    )
+
+
+async def record_price(db: AsyncIOMotorDatabase[Any], product: Product) -> None:
+    """Append a product's current price to its price history."""
+    await db.price_history.update_one(*bucket_update(product), upsert=True)
+
+
+async def record_prices(db: AsyncIOMotorDatabase[Any], products: list[Product]) -> None:
+    """Append the current prices of several products to their histories with one `bulk_write`."""
+    if products:
+        await db.price_history.bulk_write(
+            [UpdateOne(*bucket_update(product), upsert=True) for product in products],
+            ordered=False,
+        )
+
+
+async def fetch_price_history(
+    db: AsyncIOMotorDatabase[Any],
+    owner_id: ObjectId,
+    product_id: ObjectId,
+    start: datetime | None,
+    end: datetime | None,
+) -> list[PricePoint]:
+    """Fetch the price changes of a product between `start` and `end`, oldest first.
+
+    Only the buckets whose window overlaps the range are read.
+    """
+    window = timedelta(seconds=settings.PRICE_HISTORY_WINDOW_SECONDS)
+    query: dict[str, Any] = {'owner_id': owner_id, 'product_id': product_id}
+    if start is not None or end is not None:
+        query['start'] = {}
+    if start is not None:
+        query['start']['$gte'] = window_start(start, window)
+    if end is not None:
+        query['start']['$lte'] = as_utc(end)
+
+    buckets = await db.price_history.find(query, {'prices': 1}).to_list(length=None)
+    points = [
+        PricePoint(at=as_utc(price['at']), price=price['price']) for bucket in buckets for price in bucket['prices']
+    ]
+    return sorted(
+        (
+            point
+            for point in points
+            if (start is None or point.at >= as_utc(start)) and (end is None or point.at <= as_utc(end))
+        ),
+        key=lambda point: point.at,
+    )
+
+
+def downsample(points: list[PricePoint], interval: timedelta) -> list[PricePoint]:
+    """Reduce price changes to one point per interval.
+
+    Each point carries the last price of its interval and the lowest and highest prices
+    seen in it.
+    """
+    downsampled: list[PricePoint] = []
+    for point in points:
+        at = window_start(point.at, interval)
+        if downsampled and downsampled[-1].at == at:
+            last = downsampled[-1]
+            last.price = point.price
+            last.min_price = min(last.min_price or point.price, point.price)
+            last.max_price = max(last.max_price or point.price, point.price)
+        else:
+            downsampled.append(PricePoint(at=at, price=point.price, min_price=point.price, max_price=point.price))
+    return downsampled
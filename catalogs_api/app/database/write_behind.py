@@ -0,0 +1,131 @@
+import asyncio
+import contextlib
+import logging
+from collections import defaultdict
+from datetime import UTC, datetime
+from typing import Any
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import InsertOne, UpdateOne
+
+from app.core.config import settings
+from app.models import Category, Product
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """In-memory buffer for non-critical writes, flushed in the background with `bulk_write`.
+
+    Updates to the same document are merged into one (`$inc`s are summed, `$max`/`$min`
+    keep the extreme value, later `$set`s win) and inserts are batched. The buffer is
+    flushed every `WRITE_BEHIND_FLUSH_SECONDS`, or as soon as it holds
+    `WRITE_BEHIND_FLUSH_SIZE` writes. Beyond `WRITE_BEHIND_MAX_PENDING` writes, new
+    ones are dropped rather than letting memory grow under pressure.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the buffer."""
+        self.updates: defaultdict[str, dict[Any, dict[str, dict[str, Any]]]] = defaultdict(dict)
+        self.inserts: defaultdict[str, list[dict[str, Any]]] = defaultdict(list)
+        self.pending = 0
+        self.dropped = 0
+        self._flush_needed = asyncio.Event()
+        self._stopping = False
+
+    def _accept(self) -> bool:
+        """Count a new pending write, unless the buffer is full."""
+        if self.pending >= settings.WRITE_BEHIND_MAX_PENDING:
+            self.dropped += 1
+            return False
+        self.pending += 1
+        if self.pending >= settings.WRITE_BEHIND_FLUSH_SIZE:
+            self._flush_needed.set()
+        return True
+
+    def update(self, collection: str, document_id: Any, update: dict[str, dict[str, Any]]) -> None:  # noqa: ANN401
+        """Buffer an upserting update of a document, merging it with the pending one."""
+        merged = self.updates[collection].get(document_id)
+        if merged is None:
+            if not self._accept():
+                return
+            merged = self.updates[collection][document_id] = {}
+
+        for operator, fields in update.items():
+            target = merged.setdefault(operator, {})
+            for field, value in fields.items():
+                if field not in target or operator == '$set':
+                    target[field] = value
+                elif operator == '$inc':
+                    target[field] += value
+                elif operator == '$max':
+                    target[field] = max(target[field], value)
+                elif operator == '$min':
+                    target[field] = min(target[field], value)
+
+    def insert(self, collection: str, document: dict[str, Any]) -> None:
+        """Buffer a document insert."""
+        if self._accept():
+            self.inserts[collection].append(document)
+
+    async def flush(self, db: AsyncIOMotorDatabase[Any]) -> None:
+        """Write the buffered writes with one unordered `bulk_write` per collection.
+
+        Writes that fail are logged and dropped; they are not worth blocking on.
+        """
+        updates, inserts = self.updates, self.inserts
+        self.updates, self.inserts, self.pending = defaultdict(dict), defaultdict(list), 0
+
+        for collection in updates.keys() | inserts.keys():
+            count = len(updates[collection]) + len(inserts[collection])
+            try:
+                operations: list[UpdateOne | InsertOne[dict[str, Any]]] = [
+                    UpdateOne({'_id': document_id}, update, upsert=True)
+                    for document_id, update in updates[collection].items()
+                ]
+                operations.extend(InsertOne(document) for document in inserts[collection])
+                await db[collection].bulk_write(operations, ordered=False)
+            except Exception:
+                logger.exception('Dropped %d buffered writes to %s', count, collection)
+
+    async def run(self, db: AsyncIOMotorDatabase[Any]) -> None:
+        """Flush the buffer periodically until stopped, then drain it.
+
+        A failed flush is logged and does not stop the loop. Once stopped, the buffer is
+        flushed until empty, since writes may arrive while a flush is in flight.
+        """
+        while True:
+            if not self._stopping:
+                with contextlib.suppress(TimeoutError):
+                    async with asyncio.timeout(settings.WRITE_BEHIND_FLUSH_SECONDS):
+                        await self._flush_needed.wait()
+            self._flush_needed.clear()
+            try:
+                await self.flush(db)
+            except Exception:
+                logger.exception('Write-behind flush failed')
+            if self._stopping and not self.pending:
+                return
+
+    def stop(self) -> None:
+        """Ask `run` to drain the buffer and return."""
+        self._stopping = True
+        self._flush_needed.set()
+
+
+write_behind = WriteBehindBuffer()
+
+
+def audit(action: str, item: Product | Category) -> None:
+    """Record a catalog mutation in the audit log, through the write-behind buffer."""
+    kind = 'product' if isinstance(item, Product) else 'category'
+    write_behind.insert(
+        'audit_log',
+        {
+            'owner_id': item.owner_id,
+            'action': f'{kind}.{action}',
+            'target_id': item.id,
+            'seq': item.seq,
+            'at': datetime.now(UTC),
+        },
+    )
@@ -1,26 +1,65 @@
+import asyncio
+import json
+import logging
 from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
+from typing import Any
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from app.api.v1.router import api_router
 from app.core.config import settings
-from app.database.mongodb import close_mongo_connection, connect_to_mongo
+from app.core.events import broker, watch_changes
+from app.core.middleware import ServerTimingMiddleware
+from app.database.migrations import migrate_compact_schema
+from app.database.mongodb import close_mongo_connection, connect_to_mongo, create_indexes, get_database
+from app.database.write_behind import write_behind
+
+logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI) -> AsyncGenerator[None, None]:
     """Handle startup and shutdown events.
 
+    The compact schema migration runs before the app starts serving, since documents it
+    has not converted yet are invisible to the API.
+
     Yields:
         None
     """
     await connect_to_mongo()
+    database = await get_database()
+    await create_indexes(database)
+    if settings.MIGRATE_ON_STARTUP:
+        await migrate_compact_schema(database)
+    writer = asyncio.create_task(write_behind.run(database))
+    background_tasks: list[asyncio.Task[Any]] = []
+    if settings.EVENTS_SOURCE == 'change_stream':
+        background_tasks.append(asyncio.create_task(watch_changes(database)))
 
     yield
 
-    await close_mongo_connection()
+    try:
+        broker.close()
+        for task in background_tasks:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            except Exception:
+                logger.exception('Background task %s failed', task.get_name())
+    finally:
+        write_behind.stop()
+        try:
+            await writer
+        finally:
+            await close_mongo_connection()
 
 
 app = FastAPI(
@@ -30,6 +69,7 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+app.add_middleware(ServerTimingMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=['http://localhost:5173'],
@@ -44,6 +84,17 @@ app.include_router(
 )
 
 
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(_: Request, exc: RequestValidationError) -> JSONResponse:
+    """Return validation errors like FastAPI does.
+
+    Rejected `Infinity` and `NaN` inputs are echoed as strings, since JSON cannot
+    represent them as numbers.
+    """
+    errors = json.loads(json.dumps(jsonable_encoder(exc.errors())), parse_constant=str)
+    return JSONResponse(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, content={'detail': errors})
+
+
 @app.get('/')
 async def root() -> dict[str, str]:
     """Root endpoint for health check."""
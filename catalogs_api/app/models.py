@@ -1,28 +1,59 @@
 from datetime import UTC, datetime
-from typing import Annotated, Any, ClassVar
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Annotated, Any, ClassVar, Self
 
 from bson import ObjectId
-from pydantic import BaseModel, BeforeValidator, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, PlainSerializer, PlainValidator, WithJsonSchema, model_validator
 
+PRICE_SCALE = 100
 
-def parse_object_id(value: str | ObjectId) -> str:
-    """Parse ObjectId to string."""
+# Largest price in minor units, far enough below the int64 limit that bulk repricing
+# arithmetic on it cannot overflow
+MAX_PRICE = 10**9 * PRICE_SCALE
+
+
+def parse_object_id(value: str | ObjectId) -> ObjectId:
+    """Parse a string to ObjectId."""
     if isinstance(value, ObjectId):
-        return str(value)
-    return value
+        return value
+    if isinstance(value, str) and ObjectId.is_valid(value):
+        return ObjectId(value)
+    raise ValueError('Invalid ObjectId')
+
+
+def to_minor_units(price: float) -> int:
+    """Convert a price to integer minor units, e.g. cents."""
+    return int((Decimal(str(price)) * PRICE_SCALE).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_minor_units(price: int) -> float:
+    """Convert a price in integer minor units back to a decimal amount."""
+    return float(Decimal(price) / PRICE_SCALE)
+
 
+# Stored as native BSON ObjectIds, converted to strings only when serialized to JSON
+PyObjectId = Annotated[
+    ObjectId,
+    PlainValidator(parse_object_id),
+    PlainSerializer(str, return_type=str, when_used='json'),
+    WithJsonSchema({'type': 'string'}),
+]
 
-PyObjectId = Annotated[str, BeforeValidator(parse_object_id)]
+# Stored as integer minor units, converted to a decimal amount only when serialized to JSON
+Price = Annotated[
+    int, Field(gt=0, le=MAX_PRICE), PlainSerializer(from_minor_units, return_type=float, when_used='json')
+]
 
 
 class User(BaseModel):
     """User model."""
 
-    id: PyObjectId = Field(default_factory=lambda: str(ObjectId()), alias='_id')
+    id: PyObjectId = Field(default_factory=ObjectId, alias='_id')
     email: EmailStr
     hashed_password: str
     full_name: str
     created_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+    last_login_at: datetime | None = None
     is_active: bool = True
 
     class Config:
@@ -40,13 +71,24 @@ class User(BaseModel):
 
 
 class Category(BaseModel):
-    """Category model."""
+    """Category model.
 
-    id: PyObjectId = Field(default_factory=lambda: str(ObjectId()), alias='_id')
+    Categories form a tree. `path` materializes it as the ids from the root down to the
+    category itself, so a subtree is every category whose `path` contains its id.
+    """
+
+    id: PyObjectId = Field(default_factory=ObjectId, alias='_id')
     name: str
     description: str | None = None
     owner_id: PyObjectId
+    parent_id: PyObjectId | None = None
+    path: list[PyObjectId] = Field(default_factory=list)
+    external_id: str | None = None
+    content_hash: str | None = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+    seq: int = 0
+    deleted_at: datetime | None = None
 
     class Config:
         """Pydantic config."""
@@ -57,20 +99,34 @@ class Category(BaseModel):
                 'name': 'Electronics',
                 'description': 'Electronic devices and accessories',
                 'owner_id': '<owner_id>',
+                'parent_id': None,
+                'path': ['<category_id>'],
             }
         }
 
+    @model_validator(mode='after')
+    def default_path(self) -> Self:
+        """Place categories without a path at the root."""
+        if not self.path:
+            self.path = [self.id]
+        return self
+
 
 class Product(BaseModel):
     """Product model."""
 
-    id: PyObjectId = Field(default_factory=lambda: str(ObjectId()), alias='_id')
+    id: PyObjectId = Field(default_factory=ObjectId, alias='_id')
     name: str
     description: str | None = None
-    price: float = Field(gt=0)
+    price: Price
     category_id: PyObjectId
     owner_id: PyObjectId
+    external_id: str | None = None
+    content_hash: str | None = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+    seq: int = 0
+    deleted_at: datetime | None = None
 
     class Config:
         """Pydantic config."""
@@ -85,3 +141,15 @@ class Product(BaseModel):
                 'owner_id': '<owner_id>',
             }
         }
+
+
+class PricePoint(BaseModel):
+    """A product price at a point in time.
+
+    Downsampled points also carry the lowest and highest price of their interval.
+    """
+
+    at: datetime
+    price: Price
+    min_price: Price | None = None
+    max_price: Price | None = None
@@ -1,6 +1,31 @@
 from datetime import datetime
+from typing import Annotated, Literal, Self
 
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, model_validator
+
+from app.models import MAX_PRICE, PRICE_SCALE, Category, PricePoint, Product, PyObjectId
+
+# Prices are sent as decimal amounts but stored in integer minor units, where anything
+# below one minor unit would round to a price of 0
+PriceAmount = Annotated[float, Field(ge=1 / PRICE_SCALE, le=MAX_PRICE / PRICE_SCALE, allow_inf_nan=False)]
+
+# Largest bulk price increase in percent, a hundredfold
+MAX_PERCENTAGE_CHANGE = 10_000
+
+# Longest price history downsampling interval in seconds, a century
+MAX_PRICE_HISTORY_INTERVAL = 100 * 365 * 24 * 60 * 60
+
+
+def reject_nulls(update: BaseModel, fields: tuple[str, ...]) -> None:
+    """Reject fields of a partial update that are explicitly set to null.
+
+    Raises:
+        ValueError: If one of the fields is set to null.
+    """
+    for field in fields:
+        if field in update.model_fields_set and getattr(update, field) is None:
+            msg = f'{field} cannot be null'
+            raise ValueError(msg)
 
 
 class UserBase(BaseModel):
@@ -58,12 +83,21 @@ class CategoryBase(BaseModel):
 class CategoryCreate(CategoryBase):
     """Category create schema."""
 
+    parent_id: PyObjectId | None = None
+
 
 class CategoryUpdate(BaseModel):
     """Category update schema."""
 
     name: str | None = None
     description: str | None = None
+    parent_id: PyObjectId | None = None
+
+    @model_validator(mode='after')
+    def check_nulls(self) -> Self:
+        """Reject a null name, which every category needs."""
+        reject_nulls(self, ('name',))
+        return self
 
 
 class CategoryResponse(CategoryBase):
@@ -88,8 +122,8 @@ class ProductBase(BaseModel):
 
     name: str
     description: str | None = None
-    price: float = Field(gt=0)
-    category_id: str
+    price: PriceAmount
+    category_id: PyObjectId
 
 
 class ProductCreate(ProductBase):
@@ -101,8 +135,14 @@ class ProductUpdate(BaseModel):
 
     name: str | None = None
     description: str | None = None
-    price: float | None = Field(gt=0, default=None)
-    category_id: str | None = None
+    price: PriceAmount | None = None
+    category_id: PyObjectId | None = None
+
+    @model_validator(mode='after')
+    def check_nulls(self) -> Self:
+        """Reject nulls for the fields every product needs."""
+        reject_nulls(self, ('name', 'price', 'category_id'))
+        return self
 
 
 class ProductResponse(ProductBase):
@@ -120,3 +160,138 @@ class ProductResponse(ProductBase):
 
 class ProductInDB(ProductResponse):
     """Product in DB schema."""
+
+
+class SyncDeleted(BaseModel):
+    """Ids deleted since the sync token."""
+
+    products: list[PyObjectId]
+    categories: list[PyObjectId]
+
+
+class SyncResponse(BaseModel):
+    """Delta sync response schema."""
+
+    products: list[Product]
+    categories: list[Category]
+    deleted: SyncDeleted
+    next_token: str
+    has_more: bool
+
+
+class PriceHistoryQuery(BaseModel):
+    """Price history query parameters."""
+
+    start: datetime | None = Field(default=None, alias='from')
+    end: datetime | None = Field(default=None, alias='to')
+    interval: int | None = Field(
+        default=None,
+        gt=0,
+        le=MAX_PRICE_HISTORY_INTERVAL,
+        description='Downsampling interval in seconds',
+    )
+
+
+class PriceHistoryResponse(BaseModel):
+    """Price history response schema."""
+
+    product_id: PyObjectId
+    points: list[PricePoint]
+
+
+class ProductBulkFilter(BaseModel):
+    """Bulk update filter schema; an empty filter selects all of the user's products."""
+
+    category_id: PyObjectId | None = None
+    min_price: PriceAmount | None = None
+    max_price: PriceAmount | None = None
+    ids: list[PyObjectId] | None = None
+
+
+class PriceAdjustment(BaseModel):
+    """Bulk price change schema.
+
+    `percentage` scales prices by `value` percent, `absolute` adds `value` to them.
+    Results are rounded to a multiple of `round_to` and kept between it and the largest
+    price.
+    """
+
+    mode: Literal['percentage', 'absolute']
+    value: float = Field(allow_inf_nan=False)
+    rounding: Literal['nearest', 'up', 'down'] = 'nearest'
+    round_to: PriceAmount = 0.01
+
+    @model_validator(mode='after')
+    def check_value(self) -> Self:
+        """Reject changes that would make prices zero or negative, or overflow them."""
+        if self.mode == 'percentage' and self.value <= -100:  # noqa: PLR2004
+            raise ValueError('Percentage change must be greater than -100')
+        if self.mode == 'percentage' and self.value > MAX_PERCENTAGE_CHANGE:
+            msg = f'Percentage change must be at most {MAX_PERCENTAGE_CHANGE}'
+            raise ValueError(msg)
+        if self.mode == 'absolute' and abs(self.value) > MAX_PRICE / PRICE_SCALE:
+            msg = f'Absolute change must be at most {MAX_PRICE / PRICE_SCALE:g}'
+            raise ValueError(msg)
+        return self
+
+
+class ProductBulkUpdate(BaseModel):
+    """Bulk product update schema."""
+
+    filter: ProductBulkFilter = Field(default_factory=ProductBulkFilter)
+    price: PriceAdjustment | None = None
+    category_id: PyObjectId | None = None
+
+    @model_validator(mode='after')
+    def check_operation(self) -> Self:
+        """Require at least one change to apply."""
+        if self.price is None and self.category_id is None:
+            raise ValueError('Either price or category_id must be set')
+        return self
+
+
+class BulkUpdateResponse(BaseModel):
+    """Bulk update response schema."""
+
+    matched_count: int
+    modified_count: int
+
+
+class CatalogCategory(BaseModel):
+    """Catalog category schema, the desired state of a category."""
+
+    kind: Literal['category']
+    external_id: str
+    name: str
+    description: str | None = None
+    parent_external_id: str | None = None
+
+
+class CatalogProduct(BaseModel):
+    """Catalog product schema, the desired state of a product."""
+
+    kind: Literal['product']
+    external_id: str
+    name: str
+    description: str | None = None
+    price: PriceAmount
+    category_external_id: str
+
+
+CatalogItem = Annotated[CatalogCategory | CatalogProduct, Field(discriminator='kind')]
+
+
+class CatalogSyncCounts(BaseModel):
+    """Catalog upsert counts of one kind of item."""
+
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+
+
+class CatalogSyncResponse(BaseModel):
+    """Catalog upsert response schema."""
+
+    categories: CatalogSyncCounts
+    products: CatalogSyncCounts
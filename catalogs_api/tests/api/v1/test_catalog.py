@@ -0,0 +1,310 @@
+import json
+from collections.abc import Callable
+from typing import Any, cast
+
+import pytest
+from app.models import Product
+from bson import ObjectId
+from fastapi import status
+from fastapi.testclient import TestClient
+from httpx import Response
+from mongomock_motor import AsyncMongoMockCollection
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import InsertOne, UpdateOne
+
+pytestmark = pytest.mark.asyncio
+
+CATALOG: list[dict[str, Any]] = [
+    {'kind': 'category', 'external_id': 'drinks', 'name': 'Drinks'},
+    {'kind': 'category', 'external_id': 'sodas', 'name': 'Sodas', 'parent_external_id': 'drinks'},
+    {'kind': 'product', 'external_id': 'cola', 'name': 'Cola', 'price': 1.5, 'category_external_id': 'sodas'},
+    {'kind': 'product', 'external_id': 'water', 'name': 'Water', 'price': 0.99, 'category_external_id': 'drinks'},
+]
+
+
+@pytest.fixture(autouse=True)
+def recorded_prices(monkeypatch: pytest.MonkeyPatch) -> list[Product]:
+    """Capture price history writes, which go through a `bulk_write` mongomock cannot run."""
+    recorded: list[Product] = []
+
+    async def record_prices(_db: AsyncIOMotorDatabase[Any], products: list[Product]) -> None:
+        recorded.extend(products)
+
+    monkeypatch.setattr('app.database.catalog.record_prices', record_prices)
+    return recorded
+
+
+@pytest.fixture
+def bulk_writes(monkeypatch: pytest.MonkeyPatch) -> list[InsertOne[Any] | UpdateOne]:
+    """Capture `bulk_write` requests, applying them one at a time since mongomock cannot run `UpdateOne`."""
+    requests: list[InsertOne[Any] | UpdateOne] = []
+
+    async def bulk_write(
+        collection: AsyncMongoMockCollection,
+        operations: list[InsertOne[Any] | UpdateOne],
+        **_: object,
+    ) -> None:
+        requests.extend(operations)
+        for operation in operations:
+            if isinstance(operation, InsertOne):
+                await collection.insert_one(operation._doc)  # noqa: SLF001
+            else:
+                await collection.update_one(operation._filter, operation._doc)  # noqa: SLF001
+
+    monkeypatch.setattr(AsyncMongoMockCollection, 'bulk_write', bulk_write)
+    return requests
+
+
+def put_catalog(client: TestClient, auth_headers: dict[str, str], items: list[dict[str, Any]]) -> Response:
+    """Send a catalog as newline-delimited JSON."""
+    return client.put(
+        '/api/v1/catalog/',
+        content='\n'.join(json.dumps(item) for item in items),
+        headers={**auth_headers, 'Content-Type': 'application/x-ndjson'},
+    )
+
+
+async def test_put_catalog(
+    client: TestClient,
+    mongodb: AsyncIOMotorDatabase[Any],
+    auth_headers: dict[str, str],
+    recorded_prices: list[Product],
+) -> None:
+    """Test creating a catalog.
+
+    Should insert every item and resolve external ids to category ids and paths.
+    """
+    # Act
+    response = put_catalog(client, auth_headers, CATALOG)
+
+    # Assert
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['categories'] == {'inserted': 2, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+    assert response.json()['products'] == {'inserted': 2, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+    drinks = await mongodb.categories.find_one({'external_id': 'drinks'})
+    sodas = await mongodb.categories.find_one({'external_id': 'sodas'})
+    cola = await mongodb.products.find_one({'external_id': 'cola'})
+    assert drinks is not None
+    assert sodas is not None
+    assert cola is not None
+    assert sodas['path'] == [drinks['_id'], sodas['_id']]
+    assert cola['category_id'] == sodas['_id']
+    assert cola['price'] == 150  # noqa: PLR2004
+    assert cola['content_hash']
+    assert sorted(product.price for product in recorded_prices) == [99, 150]
+
+
+async def test_put_unchanged_catalog(
+    client: TestClient,
+    auth_headers: dict[str, str],
+    query_budget: Callable[[Response, int], None],
+) -> None:
+    """Test sending the same catalog twice.
+
+    Should only read the stored content hashes and write nothing.
+    """
+    # Arrange
+    put_catalog(client, auth_headers, CATALOG)
+
+    # Act
+    response = put_catalog(client, auth_headers, CATALOG)
+
+    # Assert
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['categories'] == {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 2}
+    assert response.json()['products'] == {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 2}
+    query_budget(response, 3)
+
+
+async def test_put_catalog_rewrites_items_edited_through_api(
+    client: TestClient,
+    mongodb: AsyncIOMotorDatabase[Any],
+    auth_headers: dict[str, str],
+    bulk_writes: list[InsertOne[Any] | UpdateOne],
+) -> None:
+    """Test sending the same catalog after its items were edited through the API.
+
+    Should clear the content hash on every edit and restore the edited items.
+    """
+    # Arrange
+    put_catalog(client, auth_headers, CATALOG)
+    drinks = await mongodb.categories.find_one({'external_id': 'drinks'})
+    cola = await mongodb.products.find_one({'external_id': 'cola'})
+    assert drinks is not None
+    assert cola is not None
+    client.put(f'/api/v1/categories/{drinks["_id"]}', json={'name': 'Beverages'}, headers=auth_headers)
+    client.put(f'/api/v1/products/{cola["_id"]}', json={'price': 2}, headers=auth_headers)
+    edited = await mongodb.products.find_one({'_id': cola['_id']})
+    assert edited is not None
+    bulk_writes.clear()
+
+    # Act
+    response = put_catalog(client, auth_headers, CATALOG)
+
+    # Assert
+    assert response.status_code == status.HTTP_200_OK
+    assert edited['content_hash'] is None
+    assert response.json()['categories'] == {'inserted': 0, 'updated': 1, 'deleted': 0, 'unchanged': 1}
+    assert response.json()['products'] == {'inserted': 0, 'updated': 1, 'deleted': 0, 'unchanged': 1}
+    assert all(isinstance(request, UpdateOne) for request in bulk_writes)
+    restored = await mongodb.products.find_one({'_id': cola['_id']})
+    assert restored is not None
+    assert restored['price'] == 150  # noqa: PLR2004
+    assert restored['content_hash'] == cola['content_hash']
+
+
+async def test_put_catalog_deletes_missing_items(
+    client: TestClient,
+    mongodb: AsyncIOMotorDatabase[Any],
+    auth_headers: dict[str, str],
+) -> None:
+    """Test sending a catalog without some stored items.
+
+    Should soft delete them and leave products created outside the catalog alone.
+    """
+    # Arrange
+    put_catalog(client, auth_headers, CATALOG)
+    drinks = await mongodb.categories.find_one({'external_id': 'drinks'})
+    assert drinks is not None
+    manual = client.post(
+        '/api/v1/products/',
+        json={'name': 'Juice', 'price': 2.5, 'category_id': str(drinks['_id'])},
+        headers=auth_headers,
+    ).json()
+
+    # Act
+    response = put_catalog(client, auth_headers, [CATALOG[0], CATALOG[3]])
+
+    # Assert
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['categories']['deleted'] == 1
+    assert response.json()['products']['deleted'] == 1
+    cola = await mongodb.products.find_one({'external_id': 'cola'})
+    assert cola is not None
+    assert cola['deleted_at'] is not None
+    juice = await mongodb.products.find_one({'_id': ObjectId(manual['_id'])})
+    assert juice is not None
+    assert juice['deleted_at'] is None
+
+
+async def test_put_catalog_keeps_categories_in_use(
+    client: TestClient,
+    mongodb: AsyncIOMotorDatabase[Any],
+    auth_headers: dict[str, str],
+) -> None:
+    """Test sending a catalog without categories that hold items created through the API.
+
+    Should keep the categories with live products or subcategories.
+    """
+    # Arrange
+    juices = {'kind': 'category', 'external_id': 'juices', 'name': 'Juices', 'parent_external_id': 'drinks'}
+    put_catalog(client, auth_headers, [*CATALOG[:2], juices, CATALOG[3]])
+    kept = [await mongodb.categories.find_one({'external_id': key}) for key in ('sodas', 'juices')]
+    sodas, juices_category = (str(category['_id']) for category in kept if category is not None)
+    client.post('/api/v1/categories/', json={'name': 'Diet', 'parent_id': sodas}, headers=auth_headers)
+    client.post(
+        '/api/v1/products/',
+        json={'name': 'Orange juice', 'price': 2.5, 'category_id': juices_category},
+        headers=auth_headers,
+    )
+
+    # Act
+    response = put_catalog(client, auth_headers, [CATALOG[0], CATALOG[3]])
+
+    # Assert
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['categories']['deleted'] == 0
+    for category_id in (sodas, juices_category):
+        assert client.get(f'/api/v1/categories/{category_id}', headers=auth_headers).status_code == status.HTTP_200_OK
+
+
+async def test_put_catalog_updates_changed_items(
+    client: TestClient,
+    auth_headers: dict[str, str],
+    bulk_writes: list[InsertOne[Any] | UpdateOne],
+    recorded_prices: list[Product],
+) -> None:
+    """Test sending a catalog with a changed product.
+
+    Should update it in place with one `UpdateOne`, keeping its id and recording its price.
+    """
+    # Arrange
+    put_catalog(client, auth_headers, CATALOG)
+    bulk_writes.clear()
+    recorded_prices.clear()
+    cola = {**CATALOG[2], 'price': 1.75}
+
+    # Act
+    response = put_catalog(client, auth_headers, [*CATALOG[:2], cola, CATALOG[3]])
+
+    # Assert
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['products'] == {'inserted': 0, 'updated': 1, 'deleted': 0, 'unchanged': 1}
+    [request] = bulk_writes
+    assert isinstance(request, UpdateOne)
+    update = cast(dict[str, Any], request._doc)['$set']  # noqa: SLF001
+    assert update['price'] == 175  # noqa: PLR2004
+    assert update['external_id'] == 'cola'
+    assert not {'_id', 'owner_id', 'created_at'} & update.keys()
+    assert [(product.external_id, product.price) for product in recorded_prices] == [('cola', 175)]
+
+
+async def test_put_catalog_moves_api_descendants(
+    client: TestClient,
+    mongodb: AsyncIOMotorDatabase[Any],
+    auth_headers: dict[str, str],
+    bulk_writes: list[InsertOne[Any] | UpdateOne],  # noqa: ARG001
+) -> None:
+    """Test moving catalog categories that hold subcategories created through the API.
+
+    Should move each subcategory along with its innermost moved ancestor.
+    """
+    # Arrange
+    put_catalog(client, auth_headers, CATALOG)
+    stored = {key: await mongodb.categories.find_one({'external_id': key}) for key in ('drinks', 'sodas')}
+    drinks, sodas = (str(category['_id']) for category in stored.values() if category is not None)
+    diet = client.post('/api/v1/categories/', json={'name': 'Diet', 'parent_id': sodas}, headers=auth_headers).json()
+    still = client.post(
+        '/api/v1/categories/', json={'name': 'Still', 'parent_id': drinks}, headers=auth_headers
+    ).json()
+    moved = [
+        {'kind': 'category', 'external_id': 'shop', 'name': 'Shop'},
+        {**CATALOG[0], 'parent_external_id': 'shop'},
+        {**CATALOG[1], 'parent_external_id': None},
+        *CATALOG[2:],
+    ]
+
+    # Act
+    response = put_catalog(client, auth_headers, moved)
+
+    # Assert
+    assert response.status_code == status.HTTP_200_OK
+    shop = await mongodb.categories.find_one({'external_id': 'shop'})
+    assert shop is not None
+    paths = {
+        category['_id']: [str(category_id) for category_id in category['path']]
+        async for category in mongodb.categories.find({'external_id': None})
+    }
+    assert paths == {
+        ObjectId(diet['_id']): [sodas, diet['_id']],
+        ObjectId(still['_id']): [str(shop['_id']), drinks, still['_id']],
+    }
+
+
+async def test_put_catalog_unknown_category(
+    client: TestClient,
+    mongodb: AsyncIOMotorDatabase[Any],
+    auth_headers: dict[str, str],
+) -> None:
+    """Test sending a product whose category is not in the catalog.
+
+    Should reject the line with 422, keeping the lines before it applied.
+    """
+    # Act
+    response = put_catalog(client, auth_headers, [CATALOG[0], CATALOG[3], CATALOG[2]])
+
+    # Assert
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert response.json()['detail'] == "Line 3: Unknown category 'sodas'"
+    assert await mongodb.categories.count_documents({'external_id': 'drinks'}) == 1
+    assert await mongodb.products.count_documents({'external_id': 'water'}) == 1
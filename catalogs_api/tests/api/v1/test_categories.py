@@ -0,0 +1,183 @@
+from collections.abc import Callable
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+from httpx import Response
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_delete_category_with_products(
+    client: TestClient,
+    auth_headers: dict[str, str],
+    query_budget: Callable[[Response, int], None],
+) -> None:
+    """Test deleting a category that still has products.
+
+    Should refuse the deletion after a single scoped product lookup.
+    """
+    # Arrange
+    category_id = client.post('/api/v1/categories/', json={'name': 'Drinks'}, headers=auth_headers).json()['_id']
+    client.post(
+        '/api/v1/products/',
+        json={'name': 'Soda', 'price': 4.5, 'category_id': category_id},
+        headers=auth_headers,
+    )
+
+    # Act
+    response = client.delete(f'/api/v1/categories/{category_id}', headers=auth_headers)
+
+    # Assert
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    query_budget(response, 2)
+
+
+async def test_update_category(
+    client: TestClient,
+    auth_headers: dict[str, str],
+    query_budget: Callable[[Response, int], None],
+) -> None:
+    """Test category update.
+
+    Should update and read back the category without a separate lookup.
+    """
+    # Arrange
+    category_id = client.post('/api/v1/categories/', json={'name': 'Drinks'}, headers=auth_headers).json()['_id']
+
+    # Act
+    response = client.put(f'/api/v1/categories/{category_id}', json={'name': 'Beverages'}, headers=auth_headers)
+
+    # Assert
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['name'] == 'Beverages'
+    query_budget(response, 4)
+
+
+async def test_update_category_rejects_null_name(
+    client: TestClient,
+    auth_headers: dict[str, str],
+) -> None:
+    """Test updating a category's name to null.
+
+    Should reject it with 422 while still accepting a null parent.
+    """
+    # Arrange
+    category_id = client.post('/api/v1/categories/', json={'name': 'Drinks'}, headers=auth_headers).json()['_id']
+
+    # Act
+    name_response = client.put(f'/api/v1/categories/{category_id}', json={'name': None}, headers=auth_headers)
+    parent_response = client.put(f'/api/v1/categories/{category_id}', json={'parent_id': None}, headers=auth_headers)
+
+    # Assert
+    assert name_response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert parent_response.status_code == status.HTTP_200_OK
+    assert parent_response.json()['name'] == 'Drinks'
+
+
+def create_tree(client: TestClient, auth_headers: dict[str, str]) -> dict[str, str]:
+    """Create Drinks > Soft drinks > Sodas plus a separate Snacks category."""
+    ids: dict[str, str] = {}
+    for name, parent in (('Drinks', None), ('Soft drinks', 'Drinks'), ('Sodas', 'Soft drinks'), ('Snacks', None)):
+        response = client.post(
+            '/api/v1/categories/',
+            json={'name': name, 'parent_id': ids.get(parent) if parent else None},
+            headers=auth_headers,
+        )
+        ids[name] = response.json()['_id']
+    return ids
+
+
+async def test_create_subcategory(
+    client: TestClient,
+    auth_headers: dict[str, str],
+) -> None:
+    """Test creating nested categories.
+
+    Should materialize the path from the root down to each category.
+    """
+    # Act
+    ids = create_tree(client, auth_headers)
+
+    # Assert
+    sodas = client.get(f'/api/v1/categories/{ids["Sodas"]}', headers=auth_headers).json()
+    assert sodas['parent_id'] == ids['Soft drinks']
+    assert sodas['path'] == [ids['Drinks'], ids['Soft drinks'], ids['Sodas']]
+
+
+async def test_list_products_in_subtree(
+    client: TestClient,
+    auth_headers: dict[str, str],
+    query_budget: Callable[[Response, int], None],
+) -> None:
+    """Test listing the products of a category subtree.
+
+    Should include products of all descendants without recursive lookups.
+    """
+    # Arrange
+    ids = create_tree(client, auth_headers)
+    for name in ids:
+        client.post(
+            '/api/v1/products/',
+            json={'name': f'{name} product', 'price': 1, 'category_id': ids[name]},
+            headers=auth_headers,
+        )
+
+    # Act
+    response = client.get('/api/v1/products/', params={'category_subtree': ids['Drinks']}, headers=auth_headers)
+
+    # Assert
+    assert response.status_code == status.HTTP_200_OK
+    assert sorted(product['name'] for product in response.json()) == [
+        'Drinks product',
+        'Sodas product',
+        'Soft drinks product',
+    ]
+    query_budget(response, 3)
+
+
+async def test_move_category(
+    client: TestClient,
+    auth_headers: dict[str, str],
+) -> None:
+    """Test moving a category to another parent.
+
+    Should rewrite the paths of the category and all its descendants.
+    """
+    # Arrange
+    ids = create_tree(client, auth_headers)
+
+    # Act
+    response = client.put(
+        f'/api/v1/categories/{ids["Soft drinks"]}',
+        json={'parent_id': ids['Snacks']},
+        headers=auth_headers,
+    )
+
+    # Assert
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['path'] == [ids['Snacks'], ids['Soft drinks']]
+    sodas = client.get(f'/api/v1/categories/{ids["Sodas"]}', headers=auth_headers).json()
+    assert sodas['path'] == [ids['Snacks'], ids['Soft drinks'], ids['Sodas']]
+
+
+async def test_move_category_into_own_subtree(
+    client: TestClient,
+    auth_headers: dict[str, str],
+) -> None:
+    """Test moving a category below one of its descendants.
+
+    Should refuse the move, since it would create a cycle.
+    """
+    # Arrange
+    ids = create_tree(client, auth_headers)
+
+    # Act
+    response = client.put(
+        f'/api/v1/categories/{ids["Drinks"]}',
+        json={'parent_id': ids['Sodas']},
+        headers=auth_headers,
+    )
+
+    # Assert
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,389 @@
+from collections.abc import Callable
+from typing import Any
+
+import pytest
+from app.models import Product
+from bson import ObjectId
+from fastapi import status
+from fastapi.testclient import TestClient
+from httpx import Response
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+pytestmark = pytest.mark.asyncio
+
+QueryBudget = Callable[[Response, int], None]
+
+
+def create_category(client: TestClient, auth_headers: dict[str, str], name: str = 'Drinks') -> str:
+    """Create a category and return its id."""
+    response = client.post('/api/v1/categories/', json={'name': name}, headers=auth_headers)
+    category_id: str = response.json()['_id']
+    return category_id
+
+
+def create_product(client: TestClient, auth_headers: dict[str, str], category_id: str, price: float = 4.35) -> str:
+    """Create a product and return its id."""
+    response = client.post(
+        '/api/v1/products/',
+        json={'name': 'Soda', 'price': price, 'category_id': category_id},
+        headers=auth_headers,
+    )
+    product_id: str = response.json()['_id']
+    return product_id
+
+
+async def test_create_product(
+    client: TestClient,
+    mongodb: AsyncIOMotorDatabase[Any],
+    auth_headers: dict[str, str],
+    query_budget: QueryBudget,
+) -> None:
+    """Test product creation.
+
+    Should store the price in minor units and return it as a decimal amount.
+    """
+    # Arrange
+    category_id = create_category(client, auth_headers)
+
+    # Act
+    response = client.post(
+        '/api/v1/products/',
+        json={'name': 'Soda', 'price': 4.35, 'category_id': category_id},
+        headers=auth_headers,
+    )
+
+    # Assert
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['price'] == 4.35  # noqa: PLR2004
+    product = await mongodb.products.find_one({'_id': ObjectId(response.json()['_id'])})
+    assert product is not None
+    assert product['price'] == 435  # noqa: PLR2004
+    query_budget(response, 6)
+
+
+async def test_read_products(
+    client: TestClient,
+    auth_headers: dict[str, str],
+    query_budget: QueryBudget,
+) -> None:
+    """Test listing and getting products.
+
+    Should need one command besides authentication.
+    """
+    # Arrange
+    product_id = create_product(client, auth_headers, create_category(client, auth_headers))
+
+    # Act
+    list_response = client.get('/api/v1/products/', headers=auth_headers)
+    get_response = client.get(f'/api/v1/products/{product_id}', headers=auth_headers)
+
+    # Assert
+    assert [product['_id'] for product in list_response.json()] == [product_id]
+    assert get_response.json()['_id'] == product_id
+    query_budget(list_response, 2)
+    query_budget(get_response, 2)
+
+
+async def test_update_product(
+    client: TestClient,
+    auth_headers: dict[str, str],
+    query_budget: QueryBudget,
+) -> None:
+    """Test product update.
+
+    Should update and read back the product without a separate lookup.
+    """
+    # Arrange
+    product_id = create_product(client, auth_headers, create_category(client, auth_headers))
+    category_id = create_category(client, auth_headers, 'Snacks')
+
+    # Act
+    response = client.put(
+        f'/api/v1/products/{product_id}',
+        json={'price': 5, 'category_id': category_id},
+        headers=auth_headers,
+    )
+
+    # Assert
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['price'] == 5  # noqa: PLR2004
+    assert response.json()['category_id'] == category_id
+    query_budget(response, 6)
+
+
+async def test_update_missing_product(
+    client: TestClient,
+    auth_headers: dict[str, str],
+) -> None:
+    """Test updating a product that does not exist.
+
+    Should return 404.
+    """
+    # Act
+    response = client.put(f'/api/v1/products/{ObjectId()}', json={'name': 'Water'}, headers=auth_headers)
+
+    # Assert
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+async def test_reject_out_of_range_prices(
+    client: TestClient,
+    mongodb: AsyncIOMotorDatabase[Any],
+    auth_headers: dict[str, str],
+) -> None:
+    """Test creating and updating products with prices that cannot be stored.
+
+    Should reject prices that round to 0 minor units, are too large or are not finite
+    with 422, and leave the stored product untouched.
+    """
+    # Arrange
+    category_id = create_category(client, auth_headers)
+    product_id = create_product(client, auth_headers, category_id)
+    headers = {**auth_headers, 'Content-Type': 'application/json'}
+
+    # Act
+    create_responses = [
+        client.post(
+            '/api/v1/products/',
+            content=f'{{"name": "Gum", "price": {price}, "category_id": "{category_id}"}}',
+            headers=headers,
+        )
+        for price in ('0.001', '1e20', 'Infinity', 'NaN')
+    ]
+    update_responses = [
+        client.put(f'/api/v1/products/{product_id}', content=f'{{"price": {price}}}', headers=headers)
+        for price in ('0.004', '1e20', '-Infinity')
+    ]
+
+    # Assert
+    for response in create_responses + update_responses:
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    product = await mongodb.products.find_one({'_id': ObjectId(product_id)})
+    assert product is not None
+    assert product['price'] == 435  # noqa: PLR2004
+    assert client.get(f'/api/v1/products/{product_id}', headers=auth_headers).status_code == status.HTTP_200_OK
+
+
+async def test_update_product_rejects_nulls(
+    client: TestClient,
+    auth_headers: dict[str, str],
+) -> None:
+    """Test updating required product fields to null.
+
+    Should reject them with 422 and keep the product readable.
+    """
+    # Arrange
+    product_id = create_product(client, auth_headers, create_category(client, auth_headers))
+
+    # Act
+    responses = [
+        client.put(f'/api/v1/products/{product_id}', json={field: None}, headers=auth_headers)
+        for field in ('name', 'price', 'category_id')
+    ]
+    description_response = client.put(
+        f'/api/v1/products/{product_id}', json={'description': None}, headers=auth_headers
+    )
+
+    # Assert
+    assert [response.status_code for response in responses] == [status.HTTP_422_UNPROCESSABLE_ENTITY] * 3
+    assert description_response.status_code == status.HTTP_200_OK
+    assert [product['_id'] for product in client.get('/api/v1/products/', headers=auth_headers).json()] == [product_id]
+
+
+async def test_delete_product(
+    client: TestClient,
+    auth_headers: dict[str, str],
+    query_budget: QueryBudget,
+) -> None:
+    """Test product deletion.
+
+    Should hide the product from reads.
+    """
+    # Arrange
+    product_id = create_product(client, auth_headers, create_category(client, auth_headers))
+
+    # Act
+    response = client.delete(f'/api/v1/products/{product_id}', headers=auth_headers)
+
+    # Assert
+    assert response.status_code == status.HTTP_200_OK
+    assert client.get('/api/v1/products/', headers=auth_headers).json() == []
+    query_budget(response, 4)
+
+
+async def test_price_history(
+    client: TestClient,
+    mongodb: AsyncIOMotorDatabase[Any],
+    auth_headers: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test recording and reading the price history.
+
+    Should record price changes only, into capped buckets, and return them in order.
+    """
+    # Arrange
+    monkeypatch.setattr('app.database.price_history.settings.PRICE_HISTORY_BUCKET_SIZE', 2)
+    product_id = create_product(client, auth_headers, create_category(client, auth_headers))
+    for price in (5, 5, 6.1):
+        client.put(f'/api/v1/products/{product_id}', json={'price': price}, headers=auth_headers)
+    client.put(f'/api/v1/products/{product_id}', json={'name': 'Cola'}, headers=auth_headers)
+
+    # Act
+    response = client.get(f'/api/v1/products/{product_id}/price-history', headers=auth_headers)
+
+    # Assert
+    assert response.status_code == status.HTTP_200_OK
+    assert [point['price'] for point in response.json()['points']] == [4.35, 5, 6.1]
+    assert await mongodb.price_history.count_documents({'product_id': ObjectId(product_id)}) == 2  # noqa: PLR2004
+
+
+async def test_price_history_downsampled(
+    client: TestClient,
+    auth_headers: dict[str, str],
+) -> None:
+    """Test reading a downsampled price history.
+
+    Should merge the changes of each interval into a single point.
+    """
+    # Arrange
+    product_id = create_product(client, auth_headers, create_category(client, auth_headers))
+    for price in (5, 3):
+        client.put(f'/api/v1/products/{product_id}', json={'price': price}, headers=auth_headers)
+
+    # Act
+    response = client.get(
+        f'/api/v1/products/{product_id}/price-history',
+        params={'interval': 10**9, 'from': '2000-01-01T00:00:00Z'},
+        headers=auth_headers,
+    )
+
+    # Assert
+    assert response.status_code == status.HTTP_200_OK
+    [point] = response.json()['points']
+    assert point['price'] == 3  # noqa: PLR2004
+    assert point['min_price'] == 3  # noqa: PLR2004
+    assert point['max_price'] == 5  # noqa: PLR2004
+
+
+async def test_price_history_rejects_oversized_interval(
+    client: TestClient,
+    auth_headers: dict[str, str],
+) -> None:
+    """Test reading a price history downsampled to an interval too long to represent.
+
+    Should reject it with 422.
+    """
+    # Arrange
+    product_id = create_product(client, auth_headers, create_category(client, auth_headers))
+
+    # Act
+    response = client.get(
+        f'/api/v1/products/{product_id}/price-history',
+        params={'interval': 10**14},
+        headers=auth_headers,
+    )
+
+    # Assert
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+async def test_bulk_reprice_products(
+    client: TestClient,
+    mongodb: AsyncIOMotorDatabase[Any],
+    auth_headers: dict[str, str],
+    query_budget: QueryBudget,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test bulk repricing by percentage.
+
+    Should round the matching prices up to the step in one update and record their history
+    batch by batch.
+    """
+    # Arrange
+    recorded: list[Product] = []
+
+    async def record_prices(_db: AsyncIOMotorDatabase[Any], products: list[Product]) -> None:
+        recorded.extend(products)
+
+    monkeypatch.setattr('app.api.v1.endpoints.products.record_prices', record_prices)
+    monkeypatch.setattr('app.api.v1.endpoints.products.settings.BULK_UPDATE_BATCH_SIZE', 1)
+    category_id = create_category(client, auth_headers)
+    product_ids = [create_product(client, auth_headers, category_id, price) for price in (4.35, 10.0, 50.0)]
+
+    # Act
+    response = client.post(
+        '/api/v1/products/bulk-update',
+        json={
+            'filter': {'category_id': category_id, 'max_price': 20},
+            'price': {'mode': 'percentage', 'value': 10, 'rounding': 'up', 'round_to': 0.05},
+        },
+        headers=auth_headers,
+    )
+
+    # Assert
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {'matched_count': 2, 'modified_count': 2}
+    prices = {
+        str(product['_id']): product['price']
+        async for product in mongodb.products.find({'category_id': ObjectId(category_id)})
+    }
+    assert prices == dict(zip(product_ids, (480, 1100, 5000), strict=True))
+    assert sorted(product.price for product in recorded) == [480, 1100]
+    query_budget(response, 6)
+
+
+async def test_bulk_reprice_rejects_overflowing_changes(
+    client: TestClient,
+    auth_headers: dict[str, str],
+) -> None:
+    """Test bulk repricing by changes whose results could not be stored.
+
+    Should reject them with 422.
+    """
+    # Arrange
+    create_product(client, auth_headers, create_category(client, auth_headers))
+    changes = [
+        {'mode': 'absolute', 'value': 1e20},
+        {'mode': 'percentage', 'value': 1e6},
+        {'mode': 'percentage', 'value': 10, 'round_to': 1e20},
+    ]
+
+    # Act
+    responses = [
+        client.post('/api/v1/products/bulk-update', json={'price': change}, headers=auth_headers) for change in changes
+    ]
+
+    # Assert
+    assert [response.status_code for response in responses] == [status.HTTP_422_UNPROCESSABLE_ENTITY] * len(changes)
+
+
+async def test_bulk_move_products(
+    client: TestClient,
+    mongodb: AsyncIOMotorDatabase[Any],
+    auth_headers: dict[str, str],
+) -> None:
+    """Test bulk re-categorization by ids.
+
+    Should only count products that were not already in the category as modified.
+    """
+    # Arrange
+    source_id = create_category(client, auth_headers)
+    target_id = create_category(client, auth_headers, 'Snacks')
+    moved_id = create_product(client, auth_headers, source_id)
+    unchanged_id = create_product(client, auth_headers, target_id)
+    unchanged = await mongodb.products.find_one({'_id': ObjectId(unchanged_id)})
+
+    # Act
+    response = client.post(
+        '/api/v1/products/bulk-update',
+        json={'filter': {'ids': [moved_id, unchanged_id]}, 'category_id': target_id},
+        headers=auth_headers,
+    )
+
+    # Assert
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {'matched_count': 2, 'modified_count': 1}
+    moved = await mongodb.products.find_one({'_id': ObjectId(moved_id)})
+    assert moved is not None
+    assert moved['category_id'] == ObjectId(target_id)
+    assert await mongodb.products.find_one({'_id': ObjectId(unchanged_id)}) == unchanged
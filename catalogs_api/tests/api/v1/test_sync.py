@@ -0,0 +1,237 @@
+import base64
+from typing import Any
+
+import pytest
+from app.database.changes import claim_sequence
+from app.models import Product
+from bson import ObjectId
+from fastapi import status
+from fastapi.testclient import TestClient
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+pytestmark = pytest.mark.asyncio
+
+
+def create_catalog(client: TestClient, auth_headers: dict[str, str]) -> tuple[str, str]:
+    """Create a category with one product and return their ids."""
+    category = client.post(
+        '/api/v1/categories/',
+        json={'name': 'Drinks'},
+        headers=auth_headers,
+    ).json()
+    product = client.post(
+        '/api/v1/products/',
+        json={'name': 'Soda', 'price': 4.5, 'category_id': category['_id']},
+        headers=auth_headers,
+    ).json()
+    return category['_id'], product['_id']
+
+
+async def test_full_sync(
+    client: TestClient,
+    auth_headers: dict[str, str],
+) -> None:
+    """Test sync without a token.
+
+    Should return the whole catalog and a token for the next sync.
+    """
+    # Arrange
+    category_id, product_id = create_catalog(client, auth_headers)
+
+    # Act
+    response = client.get('/api/v1/sync/', headers=auth_headers)
+
+    # Assert
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert [category['_id'] for category in data['categories']] == [category_id]
+    assert [product['_id'] for product in data['products']] == [product_id]
+    assert data['deleted'] == {'products': [], 'categories': []}
+    assert data['has_more'] is False
+
+
+async def test_delta_sync_returns_only_changes(
+    client: TestClient,
+    mongodb: AsyncIOMotorDatabase[Any],
+    auth_headers: dict[str, str],
+) -> None:
+    """Test sync with a token.
+
+    Should return only items changed since the token, and deletions as tombstones.
+    """
+    # Arrange
+    category_id, product_id = create_catalog(client, auth_headers)
+    token = client.get('/api/v1/sync/', headers=auth_headers).json()['next_token']
+    client.put(f'/api/v1/categories/{category_id}', json={'name': 'Beverages'}, headers=auth_headers)
+    client.delete(f'/api/v1/products/{product_id}', headers=auth_headers)
+
+    # Act
+    response = client.get('/api/v1/sync/', params={'since': token}, headers=auth_headers)
+
+    # Assert
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert [category['name'] for category in data['categories']] == ['Beverages']
+    assert data['products'] == []
+    assert data['deleted'] == {'products': [product_id], 'categories': []}
+
+    # The tombstone stays in the database but is hidden from regular reads
+    assert await mongodb.products.find_one({'_id': ObjectId(product_id)}) is not None
+    response = client.get(f'/api/v1/products/{product_id}', headers=auth_headers)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+async def test_sync_pages_through_changes(
+    client: TestClient,
+    auth_headers: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test sync paging.
+
+    Should split the changes into pages of `SYNC_PAGE_SIZE` items.
+    """
+    # Arrange
+    monkeypatch.setattr('app.api.v1.endpoints.sync.settings.SYNC_PAGE_SIZE', 1)
+    create_catalog(client, auth_headers)
+
+    # Act
+    first = client.get('/api/v1/sync/', headers=auth_headers).json()
+    second = client.get('/api/v1/sync/', params={'since': first['next_token']}, headers=auth_headers).json()
+
+    # Assert
+    assert len(first['categories']) == 1
+    assert first['products'] == []
+    assert first['has_more'] is True
+    assert len(second['products']) == 1
+    assert second['has_more'] is False
+
+
+async def test_sync_rejects_expired_token(
+    client: TestClient,
+    auth_headers: dict[str, str],
+) -> None:
+    """Test sync with a token older than the tombstone TTL.
+
+    Should require a full sync, since deletions may have been purged.
+    """
+    # Arrange
+    token = base64.urlsafe_b64encode(b'1:0').decode()
+
+    # Act
+    response = client.get('/api/v1/sync/', params={'since': token}, headers=auth_headers)
+
+    # Assert
+    assert response.status_code == status.HTTP_410_GONE
+
+
+async def test_sync_rejects_malformed_token(
+    client: TestClient,
+    auth_headers: dict[str, str],
+) -> None:
+    """Test sync with tokens that cannot be decoded.
+
+    Should reject them with 400, including issue times out of range.
+    """
+    # Arrange
+    tokens = ['not-a-token', base64.urlsafe_b64encode(b'1:99999999999999999999').decode()]
+
+    # Act
+    responses = [client.get('/api/v1/sync/', params={'since': token}, headers=auth_headers) for token in tokens]
+
+    # Assert
+    assert [response.status_code for response in responses] == [status.HTTP_400_BAD_REQUEST] * len(tokens)
+
+
+async def test_sync_pages_through_set_based_changes(
+    client: TestClient,
+    auth_headers: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test sync paging over a category move.
+
+    Should keep pages at `SYNC_PAGE_SIZE` items while descendants share one sequence
+    number, without repeating or skipping any of them.
+    """
+    # Arrange
+    ids: list[str] = []
+    for name in ('Drinks', 'Soft drinks', 'Sodas', 'Colas'):
+        parent_id = ids[1] if name == 'Colas' else (ids[-1] if ids else None)
+        response = client.post(
+            '/api/v1/categories/', json={'name': name, 'parent_id': parent_id}, headers=auth_headers
+        )
+        ids.append(response.json()['_id'])
+    token = client.get('/api/v1/sync/', headers=auth_headers).json()['next_token']
+    client.put(f'/api/v1/categories/{ids[1]}', json={'parent_id': None}, headers=auth_headers)
+    monkeypatch.setattr('app.api.v1.endpoints.sync.settings.SYNC_PAGE_SIZE', 2)
+
+    # Act
+    first = client.get('/api/v1/sync/', params={'since': token}, headers=auth_headers).json()
+    second = client.get('/api/v1/sync/', params={'since': first['next_token']}, headers=auth_headers).json()
+
+    # Assert
+    assert len(first['categories']) == 2  # noqa: PLR2004
+    assert first['has_more'] is True
+    assert sorted(category['_id'] for category in first['categories'] + second['categories']) == sorted(ids[1:])
+    assert second['has_more'] is False
+
+
+async def test_sync_holds_back_changes_behind_open_write(
+    client: TestClient,
+    mongodb: AsyncIOMotorDatabase[Any],
+    auth_headers: dict[str, str],
+) -> None:
+    """Test sync while a write with an earlier sequence number is still running.
+
+    Should not return later changes until the earlier write has finished.
+    """
+    # Arrange
+    category_id, _ = create_catalog(client, auth_headers)
+    token = client.get('/api/v1/sync/', headers=auth_headers).json()['next_token']
+    user = await mongodb.users.find_one({'email': 'owner@example.com'})
+    assert user is not None
+
+    # Act
+    async with claim_sequence(mongodb, user['_id']) as seq:
+        client.put(f'/api/v1/categories/{category_id}', json={'name': 'Beverages'}, headers=auth_headers)
+        during = client.get('/api/v1/sync/', params={'since': token}, headers=auth_headers).json()
+        slow = Product(name='Juice', price=250, category_id=ObjectId(category_id), owner_id=user['_id'], seq=seq)
+        await mongodb.products.insert_one(slow.model_dump(by_alias=True))
+    after = client.get('/api/v1/sync/', params={'since': during['next_token']}, headers=auth_headers).json()
+
+    # Assert
+    assert during['categories'] == []
+    assert during['products'] == []
+    assert [product['_id'] for product in after['products']] == [str(slow.id)]
+    assert [category['name'] for category in after['categories']] == ['Beverages']
+
+
+async def test_full_sync_includes_legacy_documents(
+    client: TestClient,
+    mongodb: AsyncIOMotorDatabase[Any],
+    auth_headers: dict[str, str],
+) -> None:
+    """Test sync without a token over documents written before delta sync.
+
+    Should include documents without a sequence number.
+    """
+    # Arrange
+    category_id, product_id = create_catalog(client, auth_headers)
+    user = await mongodb.users.find_one({'email': 'owner@example.com'})
+    assert user is not None
+    legacy_id = ObjectId()
+    await mongodb.products.insert_one(
+        {
+            '_id': legacy_id,
+            'name': 'Juice',
+            'price': 250,
+            'category_id': ObjectId(category_id),
+            'owner_id': user['_id'],
+        }
+    )
+
+    # Act
+    response = client.get('/api/v1/sync/', headers=auth_headers)
+
+    # Assert
+    assert response.status_code == status.HTTP_200_OK
+    assert sorted(product['_id'] for product in response.json()['products']) == sorted([product_id, str(legacy_id)])
@@ -1,11 +1,14 @@
-from collections.abc import AsyncGenerator
+import re
+from collections.abc import AsyncGenerator, Callable
 from typing import Any, cast
 
 import pytest
 from app.core.config import settings
+from app.database.instrumentation import InstrumentedDatabase
 from app.database.mongodb import db, get_database
 from app.main import app
 from fastapi.testclient import TestClient
+from httpx import Response
 from mongomock_motor import AsyncMongoMockClient
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 
@@ -29,7 +32,7 @@ async def mongodb() -> AsyncGenerator[AsyncIOMotorDatabase[Any], None]:
 
     # Override the get_database dependency
     async def override_get_database() -> AsyncIOMotorDatabase[Any]:
-        return database
+        return cast(AsyncIOMotorDatabase[Any], InstrumentedDatabase(database))
 
     app.dependency_overrides[get_database] = override_get_database
 
@@ -44,3 +47,39 @@ async def mongodb() -> AsyncGenerator[AsyncIOMotorDatabase[Any], None]:
 def client(mongodb: AsyncIOMotorDatabase[Any]) -> TestClient:  # noqa: ARG001
     """Create a test client for the FastAPI app."""
     return TestClient(app)
+
+
+@pytest.fixture
+def auth_headers(client: TestClient) -> dict[str, str]:
+    """Register a user and return authorization headers for it."""
+    user_data = {
+        'email': 'owner@example.com',
+        'password': 'testpassword123',
+        'full_name': 'Catalog Owner',
+    }
+    client.post('/api/v1/auth/register', json=user_data)
+    response = client.post(
+        '/api/v1/auth/login',
+        data={'username': user_data['email'], 'password': user_data['password']},
+    )
+    return {'Authorization': f'Bearer {response.json()["access_token"]}'}
+
+
+@pytest.fixture
+def query_budget() -> Callable[[Response, int], None]:
+    """Assert that a response issued at most a given number of MongoDB commands.
+
+    The count is read from the `Server-Timing` header, so it covers every command the
+    request issued, authentication included.
+    """
+
+    def check(response: Response, max_commands: int) -> None:
+        match = re.search(r'mongo;[^,]*desc="(\d+) commands"', response.headers['Server-Timing'])
+        assert match is not None, 'Response has no MongoDB Server-Timing metric'
+        commands = int(match.group(1))
+        assert commands <= max_commands, (
+            f'{response.request.method} {response.request.url.path} issued {commands} MongoDB commands, '
+            f'over its budget of {max_commands}'
+        )
+
+    return check
@@ -0,0 +1,246 @@
+import asyncio
+from collections.abc import AsyncIterator
+from typing import Any, Self, cast
+
+import pytest
+from app.api.v1.endpoints.events import event_stream
+from app.core.events import EventBroker, broker, watch_changes
+from app.database.changes import ChangePosition, claim_sequence
+from app.models import Category, Product
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import AutoReconnect
+
+pytestmark = pytest.mark.asyncio
+
+OWNER_ID = ObjectId('65b000000000000000000001')
+
+
+def make_product(seq: int, owner_id: ObjectId = OWNER_ID) -> Product:
+    """Build a product changed at `seq`."""
+    return Product(name='Soda', price=450, category_id=ObjectId(), owner_id=owner_id, seq=seq)
+
+
+async def test_publish_only_reaches_owner() -> None:
+    """Test publishing a change.
+
+    Should deliver the change to the owner's subscribers only.
+    """
+    # Arrange
+    events = EventBroker()
+    owner = events.subscribe(OWNER_ID)
+    other = events.subscribe(ObjectId())
+    product = make_product(1)
+
+    # Act
+    events.publish(product)
+
+    # Assert
+    assert owner.queue.get_nowait() == product
+    assert other.queue.empty()
+
+
+async def test_slow_consumer_is_evicted(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test publishing to a subscriber whose queue is full.
+
+    Should close and drop the subscription instead of buffering without bound.
+    """
+    # Arrange
+    monkeypatch.setattr('app.core.events.settings.EVENTS_QUEUE_SIZE', 1)
+    events = EventBroker()
+    subscription = events.subscribe(OWNER_ID)
+
+    # Act
+    events.publish(make_product(1))
+    events.publish(make_product(2))
+    events.publish(make_product(3))
+
+    # Assert
+    assert subscription.queue.get_nowait() is None
+    assert subscription.queue.empty()
+
+
+async def test_event_stream_resumes_from_last_event_id(mongodb: AsyncIOMotorDatabase[Any]) -> None:
+    """Test an event stream with `Last-Event-ID`.
+
+    Should replay the missed changes from the database, then stream live changes
+    without repeating replayed ones.
+    """
+    # Arrange
+    category = Category(name='Drinks', owner_id=OWNER_ID, seq=1)
+    product = make_product(2)
+    await mongodb.categories.insert_one(category.model_dump(by_alias=True))
+    await mongodb.products.insert_one(product.model_dump(by_alias=True))
+    stream = event_stream(mongodb, OWNER_ID, ChangePosition(1))
+
+    # Act
+    replayed = await anext(stream)
+    broker.publish(product)
+    live = make_product(3)
+    await mongodb.products.insert_one(live.model_dump(by_alias=True))
+    broker.publish(live)
+    streamed = await anext(stream)
+    broker.close()
+
+    # Assert
+    assert replayed.startswith(f'id: 2.{product.id}\nevent: product.upserted\ndata: {{"_id":"{product.id}"')
+    assert streamed.startswith(f'id: 3.{live.id}\nevent: product.upserted\ndata: {{"_id":"{live.id}"')
+    with pytest.raises(StopAsyncIteration):
+        await anext(stream)
+
+
+async def test_event_stream_sends_heartbeat(
+    mongodb: AsyncIOMotorDatabase[Any],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test an idle event stream.
+
+    Should send a comment as heartbeat to keep the connection open.
+    """
+    # Arrange
+    monkeypatch.setattr('app.api.v1.endpoints.events.settings.EVENTS_HEARTBEAT_SECONDS', 0.01)
+    stream = event_stream(mongodb, OWNER_ID, None)
+
+    # Act
+    heartbeat = await anext(stream)
+    await stream.aclose()
+
+    # Assert
+    assert heartbeat == ': heartbeat\n\n'
+
+
+async def test_released_claim_wakes_subscribers(mongodb: AsyncIOMotorDatabase[Any]) -> None:
+    """Test releasing a sequence claim that later writes committed behind.
+
+    Should wake the owner's subscribers up, but not for claims nothing waits behind.
+    """
+    # Arrange
+    subscription = broker.subscribe(OWNER_ID)
+    failed = claim_sequence(mongodb, OWNER_ID)
+    await failed.__aenter__()
+    async with claim_sequence(mongodb, OWNER_ID):
+        pass
+
+    # Act
+    await failed.__aexit__(LookupError, LookupError(), None)
+    broker.unsubscribe(subscription)
+
+    # Assert
+    assert subscription.queue.get_nowait() == OWNER_ID
+    assert subscription.queue.empty()
+
+
+async def test_event_stream_rereads_held_back_changes(
+    mongodb: AsyncIOMotorDatabase[Any],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test an event stream whose changes are held back by a write that fails.
+
+    Should read them again after a heartbeat, even when no wake-up comes.
+    """
+    # Arrange
+    monkeypatch.setattr('app.api.v1.endpoints.events.settings.EVENTS_HEARTBEAT_SECONDS', 0.01)
+    monkeypatch.setattr('app.core.events.settings.EVENTS_SOURCE', 'change_stream')
+    failed = claim_sequence(mongodb, OWNER_ID)
+    await failed.__aenter__()
+    async with claim_sequence(mongodb, OWNER_ID) as seq:
+        product = make_product(seq)
+        await mongodb.products.insert_one(product.model_dump(by_alias=True))
+    stream = event_stream(mongodb, OWNER_ID, ChangePosition(0))
+
+    # Act
+    held_back = await anext(stream)
+    await failed.__aexit__(LookupError, LookupError(), None)
+    released = await anext(stream)
+    await stream.aclose()
+
+    # Assert
+    assert held_back == ': heartbeat\n\n'
+    assert released.startswith(f'id: {seq}.{product.id}\nevent: product.upserted')
+
+
+class FailingChangeStream:
+    """Change stream delivering one change, then failing like a lost connection."""
+
+    def __init__(self, change: dict[str, Any]) -> None:
+        """Initialize the stream."""
+        self.change = change
+        self.resume_token: dict[str, Any] | None = None
+
+    async def __aenter__(self) -> Self:
+        """Open the stream."""
+        return self
+
+    async def __aexit__(self, *_: object) -> None:
+        """Close the stream."""
+
+    async def __aiter__(self) -> AsyncIterator[dict[str, Any]]:
+        """Deliver the change, then fail."""
+        self.resume_token = self.change['_id']
+        yield self.change
+        raise AutoReconnect
+
+
+class FailingDatabase:
+    """Database whose change streams keep failing, recording how they were resumed."""
+
+    def __init__(self, change: dict[str, Any]) -> None:
+        """Initialize the database."""
+        self.change = change
+        self.resumed_after: list[dict[str, Any] | None] = []
+
+    def watch(self, *_: object, resume_after: dict[str, Any] | None = None, **__: object) -> FailingChangeStream:
+        """Open a change stream."""
+        self.resumed_after.append(resume_after)
+        return FailingChangeStream(self.change)
+
+
+async def test_watch_changes_resumes_after_errors(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test a change stream that fails.
+
+    Should reopen the stream after the last delivered change instead of stopping.
+    """
+    # Arrange
+    monkeypatch.setattr('app.core.events.settings.EVENTS_WATCH_RETRY_SECONDS', 0)
+    product = make_product(1)
+    change = {
+        '_id': {'_data': 'token'},
+        'ns': {'coll': 'products'},
+        'fullDocument': product.model_dump(by_alias=True),
+    }
+    database = FailingDatabase(change)
+    subscription = broker.subscribe(OWNER_ID)
+
+    # Act
+    watcher = asyncio.create_task(watch_changes(cast(AsyncIOMotorDatabase[Any], database)))
+    published = [await subscription.queue.get(), await subscription.queue.get()]
+    watcher.cancel()
+    broker.unsubscribe(subscription)
+
+    # Assert
+    assert published == [product, product]
+    assert database.resumed_after[:2] == [None, change['_id']]
+
+
+async def test_watch_changes_wakes_on_released_claim(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test a change stream seeing a sequence claim released.
+
+    Should wake the owner's subscribers up.
+    """
+    # Arrange
+    monkeypatch.setattr('app.core.events.settings.EVENTS_WATCH_RETRY_SECONDS', 0)
+    change = {
+        '_id': {'_data': 'token'},
+        'ns': {'coll': 'change_counters'},
+        'documentKey': {'_id': OWNER_ID},
+    }
+    subscription = broker.subscribe(OWNER_ID)
+
+    # Act
+    watcher = asyncio.create_task(watch_changes(cast(AsyncIOMotorDatabase[Any], FailingDatabase(change))))
+    woken = await subscription.queue.get()
+    watcher.cancel()
+    broker.unsubscribe(subscription)
+
+    # Assert
+    assert woken == OWNER_ID
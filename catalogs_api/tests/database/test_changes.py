@@ -0,0 +1,59 @@
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+import pytest
+from app.database.changes import claim_sequence, committed_sequence
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+pytestmark = pytest.mark.asyncio
+
+OWNER_ID = ObjectId('65b000000000000000000001')
+
+
+async def test_committed_sequence_follows_lowest_open_claim(mongodb: AsyncIOMotorDatabase[Any]) -> None:
+    """Test overlapping writes.
+
+    Should stay just below the lowest open claim, advancing as claims are released in
+    any order without waiting for all of them.
+    """
+    # Arrange
+    first = claim_sequence(mongodb, OWNER_ID)
+    second = claim_sequence(mongodb, OWNER_ID)
+    first_seq = await first.__aenter__()
+    second_seq = await second.__aenter__()
+
+    # Act
+    while_open = await committed_sequence(mongodb, OWNER_ID)
+    await first.__aexit__(None, None, None)
+    after_first = await committed_sequence(mongodb, OWNER_ID)
+    async with claim_sequence(mongodb, OWNER_ID):
+        await second.__aexit__(None, None, None)
+        after_second = await committed_sequence(mongodb, OWNER_ID)
+
+    # Assert
+    assert while_open == first_seq - 1
+    assert after_first == second_seq - 1
+    assert after_second == second_seq
+
+
+async def test_stale_claim_is_ignored_alone(mongodb: AsyncIOMotorDatabase[Any]) -> None:
+    """Test a claim leaked by a crashed worker.
+
+    Should ignore it once it times out while still holding readers behind newer claims.
+    """
+    # Arrange
+    stale_at = datetime.now(UTC) - timedelta(hours=1)
+    await mongodb.change_counters.insert_one({'_id': OWNER_ID, 'seq': 3, 'claims': [{'seq': 2, 'at': stale_at}]})
+
+    # Act
+    without_claims = await committed_sequence(mongodb, OWNER_ID)
+    async with claim_sequence(mongodb, OWNER_ID) as seq:
+        with_claim = await committed_sequence(mongodb, OWNER_ID)
+    counter = await mongodb.change_counters.find_one({'_id': OWNER_ID})
+
+    # Assert
+    assert without_claims == 3  # noqa: PLR2004
+    assert with_claim == seq - 1
+    assert counter is not None
+    assert counter['claims'] == []
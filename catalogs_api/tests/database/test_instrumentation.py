@@ -0,0 +1,25 @@
+from typing import Any
+
+import pytest
+from app.database.instrumentation import CommandStats, InstrumentedDatabase, command_stats
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_async_for_over_instrumented_cursor(mongodb: AsyncIOMotorDatabase[Any]) -> None:
+    """Test iterating an instrumented cursor with `async for`.
+
+    Should yield every document and record the batch fetch.
+    """
+    # Arrange
+    await mongodb.products.insert_many([{'name': 'Soda'}, {'name': 'Water'}])
+    stats = CommandStats()
+    command_stats.set(stats)
+
+    # Act
+    names = [document['name'] async for document in InstrumentedDatabase(mongodb).products.find().sort('name')]
+
+    # Assert
+    assert names == ['Soda', 'Water']
+    assert stats.count == 1
@@ -0,0 +1,83 @@
+from typing import Any
+
+import pytest
+from app.database.migrations import migrate_compact_schema
+from app.models import Product
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+pytestmark = pytest.mark.asyncio
+
+OWNER_ID = '65b000000000000000000001'
+CATEGORY_ID = '65b0000000000000000000ca'
+PRODUCT_IDS = ['65b0000000000000000000a1', '65b0000000000000000000a2', '65b0000000000000000000a3']
+
+
+async def insert_legacy_catalog(mongodb: AsyncIOMotorDatabase[Any]) -> None:
+    """Insert a catalog stored with string ids and float prices."""
+    await mongodb.categories.insert_one({'_id': CATEGORY_ID, 'name': 'Drinks', 'owner_id': OWNER_ID})
+    await mongodb.products.insert_many(
+        [
+            {'_id': product_id, 'name': 'Soda', 'price': 4.35, 'category_id': CATEGORY_ID, 'owner_id': OWNER_ID}
+            for product_id in PRODUCT_IDS
+        ]
+    )
+    await mongodb.change_counters.insert_one({'_id': OWNER_ID, 'seq': 7})
+
+
+async def test_migrate_compact_schema(mongodb: AsyncIOMotorDatabase[Any]) -> None:
+    """Test the compact schema migration.
+
+    Should store ids as ObjectIds and prices as integer minor units, in batches, and
+    backfill the change tracking fields.
+    """
+    # Arrange
+    await insert_legacy_catalog(mongodb)
+
+    # Act
+    converted = await migrate_compact_schema(mongodb, batch_size=2)
+
+    # Assert
+    assert converted == {'users': 0, 'categories': 1, 'products': 3, 'change_counters': 1}
+    products = await mongodb.products.find().to_list(length=None)
+    assert sorted(product['_id'] for product in products) == [ObjectId(product_id) for product_id in PRODUCT_IDS]
+    assert {product['price'] for product in products} == {435}
+    assert {product['category_id'] for product in products} == {ObjectId(CATEGORY_ID)}
+    assert await mongodb.categories.find_one({'owner_id': ObjectId(OWNER_ID)}) is not None
+    assert Product(**products[0]).model_dump(mode='json')['price'] == 4.35  # noqa: PLR2004
+    assert {product['seq'] for product in products} == {0}
+    assert all('updated_at' in product for product in products)
+
+    # A completed migration is not run again
+    assert await migrate_compact_schema(mongodb) == {}
+
+
+async def test_migrate_compact_schema_resumes(mongodb: AsyncIOMotorDatabase[Any]) -> None:
+    """Test resuming an interrupted migration.
+
+    Should finish converting documents whose converted copy was already inserted, and
+    keep sequence numbers increasing for owners that wrote in the meantime.
+    """
+    # Arrange
+    await insert_legacy_catalog(mongodb)
+    await mongodb.products.insert_one(
+        {
+            '_id': ObjectId(PRODUCT_IDS[0]),
+            'name': 'Soda',
+            'price': 435,
+            'category_id': ObjectId(CATEGORY_ID),
+            'owner_id': ObjectId(OWNER_ID),
+        }
+    )
+    await mongodb.change_counters.insert_one({'_id': ObjectId(OWNER_ID), 'seq': 2})
+
+    # Act
+    await migrate_compact_schema(mongodb)
+
+    # Assert
+    assert await mongodb.products.count_documents({}) == len(PRODUCT_IDS)
+    assert await mongodb.products.count_documents({'_id': {'$type': 'string'}}) == 0
+    counter = await mongodb.change_counters.find_one({'_id': ObjectId(OWNER_ID)})
+    assert counter is not None
+    assert counter['seq'] == 7  # noqa: PLR2004
+    assert await mongodb.change_counters.count_documents({}) == 1
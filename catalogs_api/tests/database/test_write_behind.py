@@ -0,0 +1,164 @@
+import asyncio
+from typing import Any, cast
+
+import pytest
+from app.database.write_behind import WriteBehindBuffer
+from bson import ObjectId
+from bson.errors import InvalidDocument
+from fastapi.testclient import TestClient
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import InsertOne
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_updates_are_merged_per_document() -> None:
+    """Test buffering several updates of the same document.
+
+    Should merge them into one pending write.
+    """
+    # Arrange
+    buffer = WriteBehindBuffer()
+    product_id = ObjectId()
+
+    # Act
+    for viewed_at in (1, 3, 2):
+        buffer.update('product_stats', product_id, {'$inc': {'views': 1}, '$max': {'last_viewed': viewed_at}})
+
+    # Assert
+    assert buffer.pending == 1
+    assert buffer.updates['product_stats'][product_id] == {'$inc': {'views': 3}, '$max': {'last_viewed': 3}}
+
+
+async def test_writes_are_shed_when_full(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test buffering writes beyond `WRITE_BEHIND_MAX_PENDING`.
+
+    Should drop new writes but keep merging into pending ones.
+    """
+    # Arrange
+    monkeypatch.setattr('app.database.write_behind.settings.WRITE_BEHIND_MAX_PENDING', 1)
+    buffer = WriteBehindBuffer()
+    product_id = ObjectId()
+    buffer.update('product_stats', product_id, {'$inc': {'views': 1}})
+
+    # Act
+    buffer.update('product_stats', ObjectId(), {'$inc': {'views': 1}})
+    buffer.insert('audit_log', {'action': 'product.created'})
+    buffer.update('product_stats', product_id, {'$inc': {'views': 1}})
+
+    # Assert
+    assert buffer.dropped == 2  # noqa: PLR2004
+    assert buffer.updates['product_stats'] == {product_id: {'$inc': {'views': 2}}}
+
+
+async def test_run_drains_on_stop(mongodb: AsyncIOMotorDatabase[Any]) -> None:
+    """Test stopping the background flush.
+
+    Should write everything still buffered before returning.
+    """
+    # Arrange
+    buffer = WriteBehindBuffer()
+    task = asyncio.create_task(buffer.run(mongodb))
+    for action in ('product.created', 'product.updated'):
+        buffer.insert('audit_log', {'action': action})
+
+    # Act
+    buffer.stop()
+    await task
+
+    # Assert
+    assert buffer.pending == 0
+    assert await mongodb.audit_log.count_documents({}) == 2  # noqa: PLR2004
+
+
+async def test_run_survives_failed_flush(
+    mongodb: AsyncIOMotorDatabase[Any],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test a flush failing with an error that is not a `PyMongoError`.
+
+    Should log it, keep running and still drain later writes on stop.
+    """
+    # Arrange
+    buffer = WriteBehindBuffer()
+    flush = buffer.flush
+    failures = [InvalidDocument('cannot encode object')]
+
+    async def failing_flush(db: AsyncIOMotorDatabase[Any]) -> None:
+        if failures:
+            raise failures.pop()
+        await flush(db)
+
+    monkeypatch.setattr(buffer, 'flush', failing_flush)
+    monkeypatch.setattr('app.database.write_behind.settings.WRITE_BEHIND_FLUSH_SIZE', 1)
+    task = asyncio.create_task(buffer.run(mongodb))
+    buffer.insert('audit_log', {'action': 'product.created'})
+    await asyncio.sleep(0)
+
+    # Act
+    buffer.insert('audit_log', {'action': 'product.updated'})
+    buffer.stop()
+    await task
+
+    # Assert
+    assert not failures
+    assert await mongodb.audit_log.count_documents({'action': 'product.updated'}) == 1
+
+
+class SlowCollection:
+    """Collection whose `bulk_write` takes a while, recording what it wrote."""
+
+    def __init__(self) -> None:
+        """Initialize the collection."""
+        self.written: list[dict[str, Any]] = []
+        self.writing = asyncio.Event()
+
+    async def bulk_write(self, operations: list[InsertOne[dict[str, Any]]], **_: object) -> None:
+        """Write the documents after a delay."""
+        self.writing.set()
+        await asyncio.sleep(0.05)
+        self.written.extend(operation._doc for operation in operations)  # noqa: SLF001
+
+
+async def test_run_drains_writes_buffered_during_last_flush(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test stopping the background flush while a flush is in flight.
+
+    Should also write what was buffered after that flush started before returning.
+    """
+    # Arrange
+    monkeypatch.setattr('app.database.write_behind.settings.WRITE_BEHIND_FLUSH_SIZE', 1)
+    collection = SlowCollection()
+    buffer = WriteBehindBuffer()
+    buffer.insert('audit_log', {'action': 'product.created'})
+    task = asyncio.create_task(buffer.run(cast(AsyncIOMotorDatabase[Any], {'audit_log': collection})))
+    await collection.writing.wait()
+
+    # Act
+    buffer.insert('audit_log', {'action': 'product.updated'})
+    buffer.stop()
+    await task
+
+    # Assert
+    assert buffer.pending == 0
+    assert [document['action'] for document in collection.written] == ['product.created', 'product.updated']
+
+
+async def test_login_records_last_login(
+    client: TestClient,
+    auth_headers: dict[str, str],  # noqa: ARG001
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test logging in.
+
+    Should buffer the `last_login_at` update instead of writing it on the request path.
+    """
+    # Arrange
+    buffer = WriteBehindBuffer()
+    monkeypatch.setattr('app.api.v1.endpoints.auth.write_behind', buffer)
+
+    # Act
+    client.post('/api/v1/auth/login', data={'username': 'owner@example.com', 'password': 'testpassword123'})
+
+    # Assert
+    [update] = buffer.updates['users'].values()
+    assert 'last_login_at' in update['$set']